@@ -0,0 +1,114 @@
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Collection, List
+
+from structlog import get_logger
+
+from app.settings import (
+    ARTIST_INFO,
+    MOVIE_INFO,
+    MOVIE_SEARCH,
+    DownstreamSettings,
+)
+
+logger = get_logger()
+
+
+class Replica:
+    def __init__(self, url: str) -> None:
+        self.url = url
+        # Requests sent to the replica that didn't finish yet
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+
+    def available(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+
+class LoadBalancer:
+    """Spread the requests of a downstream across its replicas
+
+    Replicas are picked with the power of two choices: the one with fewer
+    outstanding requests out of two random ones. A replica failing (or
+    answering slower than `slow_threshold`) `eject_after` times in a row is
+    left out for `eject_time` seconds, unless every replica is ejected. Retries
+    prefer the replicas not tried yet.
+    """
+
+    def __init__(
+        self,
+        urls: Collection[str],
+        eject_after: int = 3,
+        eject_time: float = 10.0,
+        slow_threshold: float = 1.0,
+    ) -> None:
+        self.replicas = [Replica(url) for url in urls]
+        self.eject_after = eject_after
+        self.eject_time = eject_time
+        self.slow_threshold = slow_threshold
+
+    def pick(self, tried: Collection[str] = ()) -> Replica:
+        if len(self.replicas) == 1:
+            return self.replicas[0]
+
+        now = time.monotonic()
+        available = [r for r in self.replicas if r.available(now)] or self.replicas
+        candidates: List[Replica] = [r for r in available if r.url not in tried]
+        candidates = candidates or available
+        if len(candidates) == 1:
+            return candidates[0]
+
+        first, second = random.sample(candidates, 2)
+        return first if first.outstanding <= second.outstanding else second
+
+    async def request(self, replica: Replica, get: Callable[[], Awaitable]):
+        """Await `get()` against the replica recording its outcome"""
+        replica.outstanding += 1
+        started = time.monotonic()
+        failed = cancelled = False
+        try:
+            response = await get()
+            failed = response.status_code >= 500
+            return response
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        except Exception:
+            failed = True
+            raise
+        finally:
+            replica.outstanding -= 1
+            slow = time.monotonic() - started >= self.slow_threshold
+            # NOTE: cancelled attempts (timeouts, lost hedges) only count when
+            # the replica was already slow
+            if slow or not cancelled:
+                self._record(replica, failed or slow)
+
+    def _record(self, replica: Replica, failed: bool) -> None:
+        if not failed:
+            replica.consecutive_failures = 0
+            return
+
+        replica.consecutive_failures += 1
+        if replica.consecutive_failures >= self.eject_after:
+            logger.warning(
+                "Replica ejected", url=replica.url, eject_time=self.eject_time
+            )
+            replica.consecutive_failures = 0
+            replica.ejected_until = time.monotonic() + self.eject_time
+
+
+def balancer_from_settings(settings: DownstreamSettings) -> LoadBalancer:
+    return LoadBalancer(
+        settings.urls,
+        eject_after=settings.eject_after,
+        eject_time=settings.eject_time,
+        slow_threshold=settings.slow_threshold,
+    )
+
+
+MOVIE_SEARCH_BALANCER = balancer_from_settings(MOVIE_SEARCH)
+MOVIE_INFO_BALANCER = balancer_from_settings(MOVIE_INFO)
+ARTIST_INFO_BALANCER = balancer_from_settings(ARTIST_INFO)
@@ -0,0 +1,137 @@
+import os
+import time
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+from structlog import get_logger
+
+logger = get_logger()
+
+
+class CircuitBreaker:
+    """Stop calling a downstream service that keeps failing
+
+    While `closed` every request goes through and its outcome is recorded.
+    When at least `min_requests` were made in the last `window` seconds and
+    `failure_rate` of them failed the circuit opens: requests are rejected
+    right away for `cool_down` seconds. Then it's `half-open` and a single
+    trial request goes through, if it succeeds the circuit closes, otherwise
+    it opens again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.9,
+        window: float = 10.0,
+        min_requests: int = 10,
+        cool_down: float = 5.0,
+    ) -> None:
+        self.name = name
+        self.failure_rate = failure_rate
+        self.window = window
+        self.min_requests = min_requests
+        self.cool_down = cool_down
+        self.reset()
+
+    def reset(self) -> None:
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._trial_started = 0.0
+        # (monotonic time, succeeded) of the requests made in the window
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+
+    @property
+    def state(self) -> str:
+        if (
+            self._state == self.OPEN
+            and time.monotonic() - self._opened_at >= self.cool_down
+        ):
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = False
+
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a request can be made now
+
+        NOTE: a trial without outcome after `cool_down` is given up, so a
+        lost trial can't keep the circuit half-open for ever.
+        """
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if state == self.HALF_OPEN and (
+            not self._trial_in_flight or now - self._trial_started >= self.cool_down
+        ):
+            self._trial_in_flight = True
+            self._trial_started = now
+            return True
+
+        return False
+
+    def release(self) -> None:
+        """The allowed request ended without telling anything about the
+        service (e.g. cut short by the caller), a new trial can be made"""
+        self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        if self.state == self.HALF_OPEN:
+            logger.info("Circuit closed", breaker=self.name)
+            self.reset()
+            return
+
+        self._record(True)
+
+    def record_failure(self) -> None:
+        if self.state == self.HALF_OPEN:
+            self._open()
+            return
+
+        self._record(False)
+        failures = sum(1 for _, succeeded in self._outcomes if not succeeded)
+        if (
+            self._state == self.CLOSED
+            and len(self._outcomes) >= self.min_requests
+            and failures >= self.failure_rate * len(self._outcomes)
+        ):
+            self._open()
+
+    def _record(self, succeeded: bool) -> None:
+        now = time.monotonic()
+        self._outcomes.append((now, succeeded))
+        while self._outcomes and self._outcomes[0][0] <= now - self.window:
+            self._outcomes.popleft()
+
+    def _open(self) -> None:
+        logger.warning("Circuit opened", breaker=self.name, cool_down=self.cool_down)
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._trial_in_flight = False
+        self._outcomes.clear()
+
+
+def breaker_from_env(prefix: str) -> Optional[CircuitBreaker]:
+    """Circuit breaking is on by default, `<prefix>_BREAKER=0` disables it"""
+    if os.getenv(f"{prefix}_BREAKER", "1") != "1":
+        return None
+
+    # NOTE: the failure rate is of the attempts, it must stay above the rate the
+    # retries absorb, e.g. docker-compose runs artist-info failing 50% of them
+    return CircuitBreaker(
+        name=prefix.lower().replace("_", "-"),
+        failure_rate=float(os.getenv(f"{prefix}_BREAKER_FAILURE_RATE", "0.9")),
+        window=float(os.getenv(f"{prefix}_BREAKER_WINDOW", "10")),
+        min_requests=int(os.getenv(f"{prefix}_BREAKER_MIN_REQUESTS", "10")),
+        cool_down=float(os.getenv(f"{prefix}_BREAKER_COOL_DOWN", "5")),
+    )
+
+
+MOVIE_INFO_BREAKER = breaker_from_env("MOVIE_INFO")
+ARTIST_INFO_BREAKER = breaker_from_env("ARTIST_INFO")
@@ -0,0 +1,496 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional
+from urllib.parse import urlparse
+
+from structlog import get_logger
+
+from app.metrics import CACHE_LOOKUPS
+
+logger = get_logger()
+
+
+def serialize(value: Any) -> bytes:
+    """Compact encoding of the values stored out of process"""
+    return json.dumps(value, separators=(",", ":"), default=str).encode()
+
+
+def deserialize(data: bytes) -> Any:
+    return json.loads(data)
+
+
+def json_size(value: Any) -> int:
+    """Rough size in bytes of a JSON serializable value"""
+    return len(serialize(value))
+
+
+class TTLCache:
+    """In-process LRU cache whose entries expire after `ttl` seconds
+
+    The cache is bounded both by number of entries (`maxsize`) and by the
+    estimated size of the values (`max_bytes`, measured with `sizeof`), the
+    least recently used entries are evicted first.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float = 3600,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = json_size,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        # key -> (expires_at, size, value)
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._lookup(key) is not None
+
+    def _lookup(self, key: Hashable) -> Optional[tuple]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        if entry[0] <= time.monotonic():
+            self._remove(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._lookup(key)
+        return default if entry is None else entry[2]
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        """Return the fresh entries of the given keys, misses are left out"""
+        found = {}
+        for key in keys:
+            entry = self._lookup(key)
+            if entry is not None:
+                found[key] = entry[2]
+
+        return found
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if key in self._entries:
+            self._remove(key)
+
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        ttl = self.ttl if ttl is None else ttl
+        self._entries[key] = (time.monotonic() + ttl, size, value)
+        self.bytes += size
+
+        while len(self._entries) > self.maxsize or (
+            self.max_bytes is not None and self.bytes > self.max_bytes
+        ):
+            self._remove(next(iter(self._entries)))
+
+    def delete(self, key: Hashable) -> None:
+        if key in self._entries:
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+
+class CacheBackend:
+    """Interface of the cache backends
+
+    Keys are strings (prefixed with the backend `namespace` when stored
+    outside of the process) and values must be JSON serializable. Lookups
+    and updates are done in bulk so a page needs a single round trip.
+    """
+
+    def __init__(self, namespace: str = "", ttl: float = 3600) -> None:
+        self.namespace = namespace
+        self.ttl = ttl
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}" if self.namespace else key
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Return the entries found for the given keys, misses are left out"""
+        raise NotImplementedError
+
+    async def set_many(self, mapping: Dict[str, Any], ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    async def clear(self) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryBackend(CacheBackend):
+    """Per process backend, values are kept as they are in a TTLCache"""
+
+    def __init__(
+        self,
+        namespace: str = "",
+        ttl: float = 3600,
+        maxsize: int = 1024,
+        max_bytes: Optional[int] = None,
+    ) -> None:
+        super().__init__(namespace, ttl)
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl, max_bytes=max_bytes)
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        return self.cache.get_many(keys)
+
+    async def set_many(self, mapping: Dict[str, Any], ttl: Optional[float] = None):
+        for key, value in mapping.items():
+            self.cache.set(key, value, ttl)
+
+    async def clear(self) -> None:
+        self.cache.clear()
+
+
+class SQLiteBackend(CacheBackend):
+    """Backend stored in a SQLite file, shared by the workers of a host
+
+    Queries run in a thread so they don't block the event loop. Expired rows
+    are purged every `purge_every` updates.
+    """
+
+    purge_every = 100
+
+    def __init__(self, path: str, namespace: str = "", ttl: float = 3600) -> None:
+        super().__init__(namespace, ttl)
+        self.path = path
+        self._lock = threading.Lock()
+        self._updates = 0
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=5
+        )
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _get_many(self, keys: List[str]) -> Dict[str, Any]:
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT key, value FROM cache WHERE key IN ({placeholders}) "
+                "AND expires_at > ?",
+                [*keys, time.time()],
+            ).fetchall()
+
+        return {key: deserialize(value) for key, value in rows}
+
+    def _set_many(self, rows: List[tuple]) -> None:
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                rows,
+            )
+            self._updates += 1
+            if self._updates % self.purge_every == 0:
+                self._connection.execute(
+                    "DELETE FROM cache WHERE expires_at <= ?", (time.time(),)
+                )
+
+    def _clear(self) -> None:
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM cache WHERE key LIKE ?", (self._key("%"),)
+            )
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+
+        found = await asyncio.to_thread(self._get_many, [self._key(k) for k in keys])
+        return {key: found[self._key(key)] for key in keys if self._key(key) in found}
+
+    async def set_many(self, mapping: Dict[str, Any], ttl: Optional[float] = None):
+        if not mapping:
+            return
+
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        rows = [
+            (self._key(key), serialize(value), expires_at)
+            for key, value in mapping.items()
+        ]
+        await asyncio.to_thread(self._set_many, rows)
+
+    async def clear(self) -> None:
+        await asyncio.to_thread(self._clear)
+
+    async def close(self) -> None:
+        self._connection.close()
+
+
+class RedisBackend(CacheBackend):
+    """Backend talking the Redis protocol (RESP) to a shared server
+
+    A single connection is used, commands of a call are pipelined. Errors
+    talking to the server are logged and handled as cache misses.
+    """
+
+    def __init__(
+        self, url: str = "redis://localhost:6379/0", namespace: str = "", ttl=3600
+    ) -> None:
+        super().__init__(namespace, ttl)
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    @staticmethod
+    def _encode(*args) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            arg = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+
+        return b"".join(parts)
+
+    async def _read_reply(self) -> Any:
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by the server")
+
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise ConnectionError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            if int(payload) < 0:
+                return None
+            data = await self._reader.readexactly(int(payload) + 2)
+            return data[:-2]
+        if kind == b"*":
+            if int(payload) < 0:
+                return None
+            return [await self._read_reply() for _ in range(int(payload))]
+
+        raise ConnectionError(f"Unexpected reply {line!r}")
+
+    async def _execute(self, *commands: tuple) -> list:
+        """Send the commands in a single pipeline and return their replies"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            try:
+                if self._writer is None:
+                    await self._connect()
+
+                self._writer.write(b"".join(self._encode(*c) for c in commands))
+                await self._writer.drain()
+                return [await self._read_reply() for _ in commands]
+            except (OSError, ConnectionError, asyncio.IncompleteReadError):
+                await self._disconnect()
+                raise
+
+    async def _connect(self) -> None:
+        self._reader, self._writer = await asyncio.open_connection(
+            self.host, self.port
+        )
+        if self.db:
+            self._writer.write(self._encode("SELECT", self.db))
+            await self._writer.drain()
+            await self._read_reply()
+
+    async def _disconnect(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+
+        try:
+            (values,) = await self._execute(("MGET", *map(self._key, keys)))
+        except (OSError, ConnectionError, asyncio.IncompleteReadError) as exc:
+            logger.warning("Cache backend unavailable", error=repr(exc))
+            return {}
+
+        return {
+            key: deserialize(value)
+            for key, value in zip(keys, values)
+            if value is not None
+        }
+
+    async def set_many(self, mapping: Dict[str, Any], ttl: Optional[float] = None):
+        if not mapping:
+            return
+
+        ttl_ms = int((self.ttl if ttl is None else ttl) * 1000)
+        try:
+            await self._execute(
+                *[
+                    ("SET", self._key(key), serialize(value), "PX", ttl_ms)
+                    for key, value in mapping.items()
+                ]
+            )
+        except (OSError, ConnectionError, asyncio.IncompleteReadError) as exc:
+            logger.warning("Cache backend unavailable", error=repr(exc))
+
+    async def clear(self) -> None:
+        (keys,) = await self._execute(("KEYS", self._key("*")))
+        if keys:
+            await self._execute(("DEL", *keys))
+
+    async def close(self) -> None:
+        await self._disconnect()
+
+
+# memory (per worker), sqlite (shared by the workers of a host) or redis
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", "/tmp/movies-cache.sqlite3")
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+
+def create_cache_backend(
+    namespace: str,
+    ttl: float,
+    maxsize: int = 1024,
+    max_bytes: Optional[int] = None,
+    backend: str = CACHE_BACKEND,
+) -> CacheBackend:
+    """Build the configured backend, `maxsize` and `max_bytes` only apply in
+    memory, shared backends are bounded by their own configuration."""
+    if backend == "memory":
+        return MemoryBackend(namespace, ttl, maxsize=maxsize, max_bytes=max_bytes)
+    if backend == "sqlite":
+        return SQLiteBackend(CACHE_SQLITE_PATH, namespace, ttl)
+    if backend == "redis":
+        return RedisBackend(CACHE_REDIS_URL, namespace, ttl)
+
+    raise ValueError(f"Unknown cache backend {backend!r}")
+
+
+class StaleWhileRevalidateCache:
+    """Cache serving stale values while they are refreshed in background
+
+    An entry is fresh for `fresh_ttl` seconds and returned as is. For the
+    next `stale_ttl` seconds it is still returned but a single background
+    refresh (per process) is scheduled. After that it's a miss and the
+    caller waits for the fetch.
+    """
+
+    def __init__(self, backend: CacheBackend, fresh_ttl: float, stale_ttl: float):
+        # key -> [fetched_at, value], wall clock time to be shared by processes
+        self.backend = backend
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = stale_ttl
+        self._refreshing: Dict[Hashable, asyncio.Task] = {}
+
+    async def get(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable],
+        revalidate: Optional[Callable[[], Awaitable]] = None,
+    ) -> Any:
+        """Return the value of key, `fetch` it on a miss
+
+        The background refresh of stale values uses `revalidate` (defaults to
+        `fetch`), it must not depend on the current request.
+        """
+        entry = (await self.backend.get_many([key])).get(key)
+        if entry is None:
+            CACHE_LOOKUPS.inc(cache=self.backend.namespace, result="miss")
+            return await self._refresh(key, fetch)
+
+        fetched_at, value = entry
+        if time.time() - fetched_at >= self.fresh_ttl:
+            CACHE_LOOKUPS.inc(cache=self.backend.namespace, result="stale")
+            self._revalidate(key, revalidate or fetch)
+        else:
+            CACHE_LOOKUPS.inc(cache=self.backend.namespace, result="hit")
+
+        return value
+
+    async def _refresh(self, key: str, fetch: Callable[[], Awaitable]) -> Any:
+        fetched_at = time.time()
+        value = await fetch()
+        await self.backend.set_many(
+            {key: [fetched_at, value]}, ttl=self.fresh_ttl + self.stale_ttl
+        )
+
+        return value
+
+    def _revalidate(self, key: str, fetch: Callable[[], Awaitable]) -> None:
+        if key in self._refreshing:
+            return
+
+        task = asyncio.ensure_future(self._refresh(key, fetch))
+        self._refreshing[key] = task
+        task.add_done_callback(lambda task: self._revalidated(key, task))
+
+    def _revalidated(self, key: str, task: asyncio.Task) -> None:
+        self._refreshing.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Cache revalidation failed", key=key, error=task.exception())
+
+    async def clear(self) -> None:
+        await self.backend.clear()
+
+
+# Movie details barely change, so they can be kept for a long time
+MOVIE_DETAILS_CACHE = create_cache_backend(
+    "movie",
+    ttl=float(os.getenv("MOVIE_DETAILS_CACHE_TTL", "3600")),
+    maxsize=int(os.getenv("MOVIE_DETAILS_CACHE_SIZE", "10000")),
+    max_bytes=int(os.getenv("MOVIE_DETAILS_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+)
+
+ARTIST_CACHE = create_cache_backend(
+    "artist",
+    ttl=float(os.getenv("ARTIST_CACHE_TTL", "3600")),
+    maxsize=int(os.getenv("ARTIST_CACHE_SIZE", "50000")),
+    max_bytes=int(os.getenv("ARTIST_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+)
+# Ids artist-info reports as missing are remembered for a short time only
+ARTIST_CACHE_NEGATIVE_TTL = float(os.getenv("ARTIST_CACHE_NEGATIVE_TTL", "60"))
+
+# Movies ids by genre name ("" for all the movies)
+MOVIES_IDS_CACHE_FRESH_TTL = float(os.getenv("MOVIES_IDS_CACHE_FRESH_TTL", "60"))
+MOVIES_IDS_CACHE_STALE_TTL = float(os.getenv("MOVIES_IDS_CACHE_STALE_TTL", "600"))
+MOVIES_IDS_CACHE = StaleWhileRevalidateCache(
+    create_cache_backend(
+        "ids", ttl=MOVIES_IDS_CACHE_FRESH_TTL + MOVIES_IDS_CACHE_STALE_TTL, maxsize=100
+    ),
+    fresh_ttl=MOVIES_IDS_CACHE_FRESH_TTL,
+    stale_ttl=MOVIES_IDS_CACHE_STALE_TTL,
+)
+
+
+async def close_caches() -> None:
+    for backend in (MOVIE_DETAILS_CACHE, ARTIST_CACHE, MOVIES_IDS_CACHE.backend):
+        await backend.close()
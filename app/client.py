@@ -0,0 +1,98 @@
+import asyncio
+import functools
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional
+
+import httpx
+
+# NOTE: httpx keeps a pool of keep-alive connections per host (origin), these
+# limits are shared by all of them
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "50"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "5"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "1"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "5"))
+
+
+def create_http_client(
+    max_connections: int = HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections: int = HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+    timeout: float = HTTP_TIMEOUT,
+    connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+    pool_timeout: float = HTTP_POOL_TIMEOUT,
+    mounts: Optional[Dict[str, httpx.AsyncBaseTransport]] = None,
+) -> httpx.AsyncClient:
+    """Build the client shared by every request to the downstream services
+
+    It should live as long as the application, so the connections are reused
+    across requests, and be closed with `aclose` on shutdown. `mounts` routes
+    URLs to other transports, e.g. in process stubs of the downstreams.
+    """
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(timeout, connect=connect_timeout, pool=pool_timeout),
+        mounts=mounts,
+    )
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into a single one
+
+    Callers asking for a key that is already in flight wait for that call
+    and share its result or error instead of going downstream again. The
+    shared call runs in its own task so a cancelled caller doesn't cancel it
+    for the others.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]) -> Any:
+        if key not in self._calls:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+
+        return await asyncio.shield(self._calls[key])
+
+    def start_many(
+        self,
+        keys: Iterable[Hashable],
+        fn: Callable[[List[Hashable]], Dict[Hashable, Awaitable]],
+    ) -> Dict[Hashable, asyncio.Future]:
+        """Like `do` for calls that fetch many keys at once, without waiting
+
+        `fn` is called once with the keys that aren't in flight and returns
+        an awaitable by key, so each key is resolved as soon as its own value
+        is fetched. Returns the future of every key, the ones in flight
+        included, the caller decides how long to wait for each of them.
+        """
+        keys = list(dict.fromkeys(keys))
+        futures = {key: self._calls[key] for key in keys if key in self._calls}
+        own = [key for key in keys if key not in futures]
+
+        if own:
+            for key, awaitable in fn(own).items():
+                future = self._calls[key] = asyncio.ensure_future(awaitable)
+                future.add_done_callback(functools.partial(self._forget, key))
+                futures[key] = future
+
+        return {key: futures[key] for key in keys}
+
+    def _forget(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
+
+
+MOVIE_SEARCH_FLIGHTS = SingleFlight()
+MOVIE_INFO_FLIGHTS = SingleFlight()
+ARTIST_INFO_FLIGHTS = SingleFlight()
@@ -0,0 +1,43 @@
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency, `fast-json` extra
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    # NOTE: the models are built by the services with `construct`, their
+    # fields are already of the output types so no need of `.dict()`
+    if isinstance(obj, BaseModel):
+        return obj.__dict__
+
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode the content, models included, to compact JSON bytes
+
+    orjson is used when installed, the standard library otherwise.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoding the content as is with `dumps`
+
+    Returning it from an endpoint skips the `response_model` validation and
+    serialization, the `response_model` is still used for the OpenAPI schema.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -40,3 +40,9 @@ GENRES_MAP = [
     {"id": 10752, "name": "War"},
     {"id": 37, "name": "Western"},
 ]
+
+# NOTE: built once, the lookups by movie are on the hot path
+# Genres by name
+GENRES_BY_NAME = {genre["name"]: Genre(**genre) for genre in GENRES_MAP}
+# Position in GENRES_MAP by genre id, to list the genres in its order
+GENRES_POSITION = {genre["id"]: position for position, genre in enumerate(GENRES_MAP)}
@@ -0,0 +1,94 @@
+import asyncio
+import os
+from typing import Awaitable, Callable, Optional
+
+from structlog import get_logger
+
+logger = get_logger()
+
+
+class HedgePolicy:
+    """When to send a duplicate (hedge) of a slow downstream request
+
+    After `delay` seconds without an answer a second identical request is
+    fired and the first 200 wins, the other one is cancelled. A `delay` of 0
+    hedges right away, useful for very flaky services. To cap the extra load
+    at most `max_ratio` of the requests made with this policy are hedged: each
+    request adds `max_ratio` tokens to a budget of at most `burst` tokens and
+    each hedge takes one, so quiet periods can't save up more than `burst`
+    hedges for the next slowdown.
+    """
+
+    def __init__(
+        self, delay: float = 0.1, max_ratio: float = 0.1, burst: float = 1.0
+    ) -> None:
+        self.delay = delay
+        self.max_ratio = max_ratio
+        self.burst = burst
+        self.tokens = 0.0
+        self.requests = 0
+        self.hedges = 0
+
+    def record_request(self) -> None:
+        self.requests += 1
+        self.tokens = min(self.tokens + self.max_ratio, max(self.burst, 1.0))
+
+    def acquire_hedge(self) -> bool:
+        if self.tokens < 1:
+            return False
+
+        self.tokens -= 1
+        self.hedges += 1
+        return True
+
+
+def hedge_policy_from_env(prefix: str) -> Optional[HedgePolicy]:
+    """Hedging is opt-in: enabled only when `<prefix>_HEDGE_DELAY` is set"""
+    delay = os.getenv(f"{prefix}_HEDGE_DELAY")
+    if delay is None:
+        return None
+
+    return HedgePolicy(
+        delay=float(delay),
+        max_ratio=float(os.getenv(f"{prefix}_HEDGE_MAX_RATIO", "0.1")),
+        burst=float(os.getenv(f"{prefix}_HEDGE_BURST", "1")),
+    )
+
+
+MOVIE_INFO_HEDGE_POLICY = hedge_policy_from_env("MOVIE_INFO")
+ARTIST_INFO_HEDGE_POLICY = hedge_policy_from_env("ARTIST_INFO")
+
+
+async def hedged_request(get: Callable[[], Awaitable], policy: HedgePolicy):
+    """Await `get()` hedging it with a duplicate request according to policy
+
+    Returns the first 200 response. If no request succeeds the last response
+    is returned (or its exception raised) so the caller can retry.
+    """
+    policy.record_request()
+    pending = {asyncio.ensure_future(get())}
+    hedged = False
+    last = None
+
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=None if hedged else policy.delay,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            for task in done:
+                last = task
+                if task.exception() is None and task.result().status_code == 200:
+                    return task.result()
+
+            if not done and not hedged:
+                hedged = True
+                if policy.acquire_hedge():
+                    logger.info("Hedging request", delay=policy.delay)
+                    pending.add(asyncio.ensure_future(get()))
+
+        return last.result()
+    finally:
+        for task in pending:
+            task.cancel()
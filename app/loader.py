@@ -0,0 +1,112 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Set
+
+from structlog import get_logger
+
+from app.metrics import BATCH_SIZE
+from app.settings import ARTIST_INFO, MOVIE_INFO
+
+logger = get_logger()
+
+# How long the ids are collected before sending a batch that isn't full
+LOADER_WINDOW = float(os.getenv("LOADER_WINDOW", "0.002"))
+
+BatchFunction = Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]]
+
+
+class BatchLoader:
+    """Collect the keys requested by every in-flight request into full batches
+
+    Keys are queued for `window` seconds or until `max_batch_size` of them
+    are waiting, then fetched with a single call of the batch function and
+    the results are fanned back to each waiter.
+
+    Every caller passes its batch function, they must be equivalent: the one
+    of the caller that opened a batch is used for the whole batch.
+    """
+
+    def __init__(
+        self, max_batch_size: int = 5, window: float = LOADER_WINDOW, name: str = ""
+    ):
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.window = window
+        self._batch: Dict[Hashable, asyncio.Future] = {}
+        self._batch_fn: Optional[BatchFunction] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def load_many(
+        self, keys: Iterable[Hashable], batch_fn: BatchFunction
+    ) -> Dict[Hashable, Any]:
+        """Return the values of the keys, the ones left out by the batch
+        function are left out too. Values the batch function returned for
+        keys nobody asked for are included."""
+        futures = self.load_each(keys, batch_fn)
+        loaded = await asyncio.gather(*[asyncio.shield(f) for f in futures.values()])
+
+        results: Dict[Hashable, Any] = {}
+        for values in loaded:
+            results.update(values)
+
+        return results
+
+    def load_each(
+        self, keys: Iterable[Hashable], batch_fn: BatchFunction
+    ) -> Dict[Hashable, asyncio.Future]:
+        """Queue the keys and return the future of each of them, resolved as
+        soon as its batch is loaded with the values of `load_many` for it:
+        its own, if any, and the ones of the keys nobody asked for"""
+        return {key: self._load(key, batch_fn) for key in dict.fromkeys(keys)}
+
+    def _load(self, key: Hashable, batch_fn: BatchFunction) -> asyncio.Future:
+        if key in self._batch:
+            return self._batch[key]
+
+        loop = asyncio.get_running_loop()
+        if not self._batch:
+            self._batch_fn = batch_fn
+
+        future = self._batch[key] = loop.create_future()
+        if len(self._batch) >= self.max_batch_size:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._dispatch)
+
+        return future
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._batch = self._batch, {}
+        BATCH_SIZE.observe(len(batch), loader=self.name)
+        task = asyncio.ensure_future(self._run(batch, self._batch_fn))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    async def _run(batch: Dict[Hashable, asyncio.Future], batch_fn: BatchFunction):
+        try:
+            results = dict(await batch_fn(list(batch)))
+        except Exception as exc:
+            logger.warning("Batch load failed", keys=list(batch), error=repr(exc))
+            for future in batch.values():
+                future.set_exception(exc)
+                # NOTE: avoid the warning when nobody is waiting for it anymore
+                future.exception()
+            return
+
+        extras = {key: value for key, value in results.items() if key not in batch}
+        for key, future in batch.items():
+            future.set_result({**extras, key: results[key]} if key in results else extras)
+
+
+MOVIE_INFO_LOADER = BatchLoader(
+    max_batch_size=MOVIE_INFO.batch_size, name=MOVIE_INFO.name
+)
+ARTIST_INFO_LOADER = BatchLoader(
+    max_batch_size=ARTIST_INFO.batch_size, name=ARTIST_INFO.name
+)
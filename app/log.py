@@ -0,0 +1,223 @@
+import atexit
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, TextIO
+
+import structlog
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# "console" for humans, "json" for the log collectors
+LOG_FORMAT = os.getenv("LOG_FORMAT", "console")
+# Longer field values are truncated, 0 disables it
+LOG_MAX_FIELD_LENGTH = int(os.getenv("LOG_MAX_FIELD_LENGTH", "256"))
+# Events waiting to be written, the new ones are dropped when it's full
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Rate of the events written by event name,
+# e.g. "Response Sucessfull=0.01,GET movies details=0.1"
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "")
+
+EventDict = Dict[str, Any]
+
+
+class Lazy:
+    """Log field computed only when the event is written, by the writer thread
+
+    `logger.info("Response", response=Lazy(response.json))`
+    """
+
+    __slots__ = ("fn",)
+
+    def __init__(self, fn: Callable[[], Any]) -> None:
+        self.fn = fn
+
+
+def parse_sampling(value: str) -> Dict[str, float]:
+    rates = {}
+    for item in filter(None, (i.strip() for i in value.split(","))):
+        event, _, rate = item.rpartition("=")
+        rates[event.strip()] = float(rate)
+
+    return rates
+
+
+def sample(rates: Dict[str, float]):
+    """Drop the events of the sampled names but `rate` of them"""
+
+    def processor(logger, method_name: str, event_dict: EventDict) -> EventDict:
+        rate = rates.get(event_dict.get("event"))
+        if rate is not None and random.random() >= rate:
+            raise structlog.DropEvent
+
+        return event_dict
+
+    return processor
+
+
+def capture_context(logger, method_name: str, event_dict: EventDict) -> EventDict:
+    """Keep what can't be known later, by the writer thread"""
+    event_dict["level"] = method_name
+    event_dict["timestamp"] = time.time()
+    if event_dict.get("exc_info") is True:
+        event_dict["exc_info"] = sys.exc_info()
+
+    return event_dict
+
+
+def resolve_lazy(logger, method_name: str, event_dict: EventDict) -> EventDict:
+    for key, value in event_dict.items():
+        if isinstance(value, Lazy):
+            try:
+                event_dict[key] = value.fn()
+            except Exception as exc:
+                event_dict[key] = f"<{exc!r}>"
+
+    return event_dict
+
+
+def format_timestamp(logger, method_name: str, event_dict: EventDict) -> EventDict:
+    event_dict["timestamp"] = datetime.fromtimestamp(
+        event_dict["timestamp"], timezone.utc
+    ).isoformat()
+    return event_dict
+
+
+def truncate(max_length: int):
+    """Cut the values of the fields longer than `max_length` once rendered"""
+
+    def processor(logger, method_name: str, event_dict: EventDict) -> EventDict:
+        for key, value in event_dict.items():
+            if key in ("event", "exception") or isinstance(value, (int, float)):
+                continue
+
+            text = value if isinstance(value, str) else repr(value)
+            if len(text) > max_length:
+                event_dict[key] = (
+                    f"{text[:max_length]}...({len(text) - max_length} more chars)"
+                )
+
+        return event_dict
+
+    return processor
+
+
+class QueueWriter:
+    """Render and write the log events in a background thread
+
+    The events are queued as they are logged, so the request never waits on
+    formatting nor on the output. When the queue is full the events are
+    dropped and counted.
+    """
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        processors: List[Callable],
+        maxsize: int = LOG_QUEUE_SIZE,
+        stream: Optional[TextIO] = None,
+    ) -> None:
+        self.processors = processors
+        self.stream = stream
+        self.queue: queue.Queue = queue.Queue(maxsize)
+        self.dropped = 0
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def put(self, event_dict: EventDict) -> None:
+        if self._thread is None:
+            self._start()
+        try:
+            self.queue.put_nowait(event_dict)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="log-writer", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def _run(self) -> None:
+        while True:
+            event_dict = self.queue.get()
+            try:
+                if event_dict is self._STOP:
+                    return
+                self.write(event_dict)
+            finally:
+                self.queue.task_done()
+
+    def write(self, event_dict: EventDict) -> None:
+        try:
+            line = event_dict
+            for processor in self.processors:
+                line = processor(None, event_dict.get("level"), line)
+            stream = self.stream or sys.stdout
+            stream.write(line + "\n")
+            stream.flush()
+        except structlog.DropEvent:
+            pass
+        except (ValueError, OSError):
+            # NOTE: the stream was closed, e.g. on interpreter shutdown
+            pass
+
+    def flush(self) -> None:
+        """Wait until the queued events are written"""
+        if self._thread is not None:
+            self.queue.join()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self.queue.put(self._STOP)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+class QueueLogger:
+    """structlog logger handing the event dict over to the writer"""
+
+    def __init__(self, writer: QueueWriter) -> None:
+        self.writer = writer
+
+    def msg(self, **event_dict: Any) -> None:
+        self.writer.put(event_dict)
+
+    debug = info = warning = warn = error = critical = exception = fatal = msg
+
+
+WRITER = QueueWriter(
+    processors=[
+        resolve_lazy,
+        format_timestamp,
+        structlog.processors.format_exc_info,
+        *([truncate(LOG_MAX_FIELD_LENGTH)] if LOG_MAX_FIELD_LENGTH else []),
+        structlog.processors.JSONRenderer()
+        if LOG_FORMAT == "json"
+        else structlog.dev.ConsoleRenderer(colors=False),
+    ]
+)
+
+
+def configure_logging(level: str = LOG_LEVEL, sampling: str = LOG_SAMPLING) -> None:
+    """Configure structlog so the events below `level` cost a method call and
+    the others are only captured on the calling thread, see QueueWriter"""
+    structlog.configure(
+        processors=[
+            sample(parse_sampling(sampling)),
+            capture_context,
+        ],
+        wrapper_class=structlog.make_filtering_bound_logger(
+            logging.getLevelName(level.upper())
+        ),
+        logger_factory=lambda *args: QueueLogger(WRITER),
+        cache_logger_on_first_use=True,
+    )
@@ -1,13 +1,59 @@
-from typing import Optional, TypedDict, List
+from typing import AsyncIterator, Optional, TypedDict, List
 from app import schemas
-from fastapi import FastAPI
-import requests
-from app.entities import Error
-from app.services import MovieService, get_genre
+from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException, Query, Request
+from app import prefetch
+from fastapi.responses import PlainTextResponse, StreamingResponse
+import httpx
+from app.cache import close_caches
+from app.client import create_http_client
+from app.encoding import FastJSONResponse, dumps
+from app.log import configure_logging
+from app.metrics import (
+    MOVIES_BATCH_REQUEST_DURATION,
+    MOVIES_REQUEST_DURATION,
+    REGISTRY,
+    observe_duration,
+)
+from app.tracing import traced
+from app.entities import Error, Genre
+from app.pagination import ID_SNAPSHOTS, Cursor, InvalidCursor
+from app.retry import REQUEST_DEADLINE, Deadline
+from app.services import DownstreamError, MovieService, get_genre
 from urllib.parse import unquote_plus
 
+configure_logging()
+
 app = FastAPI()
 
+NDJSON = "application/x-ndjson"
+
+
+@app.on_event("startup")
+async def open_http_client():
+    app.state.http_client = create_http_client()
+
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await app.state.http_client.aclose()
+
+
+@app.on_event("shutdown")
+async def close_cache_backends():
+    await close_caches()
+    await ID_SNAPSHOTS.backend.close()
+
+
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    return request.app.state.http_client
+
+
+async def prefetch_movies(client: httpx.AsyncClient, movies_ids: List[int]) -> None:
+    movie_service = MovieService(
+        client, deadline=Deadline(prefetch.PREFETCH_DEADLINE), count_errors=False
+    )
+    prefetch.PREFETCHER.schedule(lambda: movie_service.prefetch(movies_ids))
+
 
 @app.get("/")
 def health_check():
@@ -22,6 +68,7 @@ class MetaData(TypedDict):
     offset: int
     limit: Optional[int]
     total: int  # TODO
+    nextCursor: Optional[str]
 
 
 class MoviesOutput(TypedDict):
@@ -30,25 +77,189 @@ class MoviesOutput(TypedDict):
     errors: Optional[List[Error]]
 
 
+class MoviesBatchOutput(TypedDict):
+    results: List[MoviesOutput]
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Metrics of this process in the Prometheus text format"""
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @app.get("/movies", response_model=MoviesOutput)
-def list_movies(
+@observe_duration(MOVIES_REQUEST_DURATION)
+@traced("movies")
+async def list_movies(
+    request: Request,
+    background_tasks: BackgroundTasks,
     genre: Optional[str] = None,
     offset: Optional[int] = 0,
     limit: Optional[int] = 10,
+    cursor: Optional[str] = None,
+    deadline: Optional[float] = Query(None, gt=0),
+    client: httpx.AsyncClient = Depends(get_http_client),
 ):
-    movie_service = MovieService(requests)
+    """List movies by genre
+
+    Pages can be requested with `offset` or with the `cursor` returned as
+    `metadata.nextCursor` by the previous page, which keeps paging through the
+    same list of movies.
+
+    `deadline` is the latency budget in seconds (at most, and by default,
+    REQUEST_DEADLINE). Once it's over the movies and cast assembled so far
+    are returned and the rest is reported with the 440/450/460 errors.
+
+    With `Accept: application/x-ndjson` the movies are streamed as soon as
+    they are ready, followed by a line with the `metadata` and `errors`.
+    """
+    budget = min(deadline, REQUEST_DEADLINE) if deadline else REQUEST_DEADLINE
+    movie_service = MovieService(client, deadline=Deadline(budget))
     if genre:
         genre = get_genre(unquote_plus(genre))
 
-    movies, total = movie_service.list(genre, offset, limit)
+    if cursor:
+        try:
+            cursor = Cursor.decode(cursor)
+        except InvalidCursor as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        offset = cursor.offset
+
+    if NDJSON in request.headers.get("accept", ""):
+        return await stream_movies(
+            movie_service, background_tasks, genre, offset, limit, cursor
+        )
+
+    prefetch.PREFETCHER.request_started()
+    try:
+        movies, total = await movie_service.list(genre, offset, limit, cursor)
+    except DownstreamError as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+    finally:
+        prefetch.PREFETCHER.request_finished()
     errors = movie_service.errors
 
-    return MoviesOutput(
-        data=DataMovies(movies=movies),
-        metadata=MetaData(
-            offset=offset,
-            limit=limit if total >= limit else total,
-            total=total
-        ),
-        errors=errors,
+    if prefetch.PREFETCH_NEXT_PAGE and movie_service.next_ids:
+        background_tasks.add_task(prefetch_movies, client, movie_service.next_ids)
+
+    # NOTE: the movies are built by the service, no need to validate them again
+    # against the response_model
+    return FastJSONResponse(
+        MoviesOutput(
+            data=DataMovies(movies=movies),
+            metadata=build_metadata(offset, limit, total, movie_service.next_cursor),
+            errors=errors,
+        )
+    )
+
+
+@app.post("/movies/batch", response_model=MoviesBatchOutput)
+@observe_duration(MOVIES_BATCH_REQUEST_DURATION)
+@traced("movies_batch")
+async def list_movies_batch(
+    batch: schemas.MoviesBatchInput,
+    client: httpx.AsyncClient = Depends(get_http_client),
+):
+    """List the movies of several genres or pages at once
+
+    Answers every query like `/movies` does, in the same order, but the
+    movies and artists shared by the queries are requested only once. Each
+    result has the errors of its own movies, a query whose movies ids can't
+    be retrieved gets no movies and a 503 error. The whole request fails
+    with 503 only when every query failed.
+
+    `deadline` is the latency budget of the whole batch, as in `/movies`.
+    """
+    budget = REQUEST_DEADLINE
+    if batch.deadline:
+        budget = min(batch.deadline, REQUEST_DEADLINE)
+    movie_service = MovieService(client, deadline=Deadline(budget))
+    queries = [
+        (get_genre(query.genre) if query.genre else None, query.offset, query.limit)
+        for query in batch.queries
+    ]
+
+    prefetch.PREFETCHER.request_started()
+    try:
+        pages = await movie_service.list_many(queries)
+    except DownstreamError as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+    finally:
+        prefetch.PREFETCHER.request_finished()
+
+    return FastJSONResponse(
+        MoviesBatchOutput(
+            results=[
+                MoviesOutput(
+                    data=DataMovies(movies=page.movies),
+                    metadata=build_metadata(
+                        query.offset, query.limit, page.total, page.next_cursor
+                    ),
+                    errors=page.errors,
+                )
+                for query, page in zip(batch.queries, pages)
+            ]
+        )
     )
+
+
+def build_metadata(
+    offset: Optional[int], limit: Optional[int], total, next_cursor: Optional[str]
+) -> MetaData:
+    return MetaData(
+        offset=offset,
+        limit=limit if total >= limit else total,
+        total=total,
+        nextCursor=next_cursor,
+    )
+
+
+async def stream_movies(
+    movie_service: MovieService,
+    background_tasks: BackgroundTasks,
+    genre: Optional[Genre],
+    offset: Optional[int],
+    limit: Optional[int],
+    cursor: Optional[Cursor],
+) -> StreamingResponse:
+    """Stream the movies as NDJSON, one line per movie as soon as it's ready
+    and a trailing line with the `metadata` and `errors`."""
+    # NOTE: the request is in flight until the stream ends, which may never
+    # start, so it's finished by whichever of these ends it first
+    request_finished = prefetch.PREFETCHER.track_request()
+    try:
+        movies_ids, total = await movie_service.list_page_ids(
+            genre, offset, limit, cursor
+        )
+    except DownstreamError as exc:
+        request_finished()
+        raise HTTPException(status_code=503, detail=str(exc))
+    except BaseException:
+        request_finished()
+        raise
+
+    async def lines() -> AsyncIterator[bytes]:
+        try:
+            async for movie in movie_service.stream_details(movies_ids):
+                yield dumps(movie) + b"\n"
+        finally:
+            request_finished()
+
+        yield dumps(
+            {
+                "metadata": build_metadata(
+                    offset, limit, total, movie_service.next_cursor
+                ),
+                "errors": movie_service.errors,
+            }
+        ) + b"\n"
+
+    background_tasks.add_task(request_finished)
+    if prefetch.PREFETCH_NEXT_PAGE and movie_service.next_ids:
+        background_tasks.add_task(
+            prefetch_movies, movie_service.client, movie_service.next_ids
+        )
+
+    return StreamingResponse(lines(), media_type=NDJSON)
@@ -0,0 +1,258 @@
+import functools
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+from starlette.responses import StreamingResponse
+
+# NOTE: the metrics are only updated from the event loop thread, so the plain
+# (lock-free) increments are safe. Every process exposes its own values.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return f"{{{pairs}}}"
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        return "\n".join(
+            (
+                f"# HELP {self.name} {self.documentation}",
+                f"# TYPE {self.name} {self.type}",
+                *self.samples(),
+            )
+        )
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.values: Dict[LabelValues, float] = defaultdict(float)
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        self.values[self._key(labels)] += amount
+
+    def get(self, **labels: str) -> float:
+        return self.values.get(self._key(labels), 0)
+
+    def samples(self) -> Iterable[str]:
+        for key, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+    def clear(self) -> None:
+        self.values.clear()
+
+
+class Histogram(Metric):
+    """Observations counted by bucket, rendered as cumulative `le` buckets"""
+
+    type = "histogram"
+
+    def __init__(
+        self, *args, buckets: Sequence[float] = LATENCY_BUCKETS, **kwargs
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # per label values: the counts of each bucket (plus +Inf) and the sum
+        self.counts: Dict[LabelValues, List[int]] = {}
+        self.sums: Dict[LabelValues, float] = defaultdict(float)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        counts = self.counts.get(key)
+        if counts is None:
+            counts = self.counts[key] = [0] * (len(self.buckets) + 1)
+        counts[bisect_left(self.buckets, value)] += 1
+        self.sums[key] += value
+
+    def count(self, **labels: str) -> int:
+        return sum(self.counts.get(self._key(labels), ()))
+
+    def samples(self) -> Iterable[str]:
+        names = (*self.labelnames, "le")
+        for key, counts in self.counts.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                labels = _format_labels(names, (*key, str(bound)))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {self.sums[key]}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+    def clear(self) -> None:
+        self.counts.clear()
+        self.sums.clear()
+
+
+M = TypeVar("M", bound=Metric)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: M) -> M:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Metrics in the Prometheus text exposition format"""
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+    def clear(self) -> None:
+        for metric in self.metrics:
+            metric.clear()
+
+
+def observe_duration(histogram: Histogram):
+    """Observe the duration of the decorated endpoint by response `status`
+
+    The status of the HTTP errors raised is used, 500 for any other error.
+    Streamed responses are observed once their body is sent.
+    """
+
+    def decorator(endpoint: Callable[..., Awaitable]):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                response = await endpoint(*args, **kwargs)
+            except Exception as exc:
+                status = getattr(exc, "status_code", 500)
+                histogram.observe(time.perf_counter() - started, status=str(status))
+                raise
+
+            if isinstance(response, StreamingResponse):
+                response.body_iterator = _observe_body(
+                    response.body_iterator, histogram, started
+                )
+            else:
+                status = getattr(response, "status_code", 200)
+                histogram.observe(time.perf_counter() - started, status=str(status))
+
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+async def _observe_body(
+    body: AsyncIterator, histogram: Histogram, started: float
+) -> AsyncIterator:
+    status = 200
+    try:
+        async for chunk in body:
+            yield chunk
+    except Exception:
+        status = 500
+        raise
+    finally:
+        histogram.observe(time.perf_counter() - started, status=str(status))
+
+
+REGISTRY = Registry()
+
+MOVIES_REQUEST_DURATION = REGISTRY.register(
+    Histogram(
+        "movies_request_duration_seconds",
+        "Time to answer a /movies request",
+        ["status"],
+    )
+)
+MOVIES_BATCH_REQUEST_DURATION = REGISTRY.register(
+    Histogram(
+        "movies_batch_request_duration_seconds",
+        "Time to answer a /movies/batch request",
+        ["status"],
+    )
+)
+MOVIES_ERRORS = REGISTRY.register(
+    Counter("movies_errors_total", "Errors reported in /movies responses", ["code"])
+)
+DOWNSTREAM_REQUEST_DURATION = REGISTRY.register(
+    Histogram(
+        "downstream_request_duration_seconds",
+        "Time of a downstream request, retries included",
+        ["downstream"],
+    )
+)
+DOWNSTREAM_ATTEMPTS = REGISTRY.register(
+    Counter(
+        "downstream_attempts_total",
+        "Attempts of the downstream requests by outcome",
+        ["downstream", "outcome"],
+    )
+)
+DOWNSTREAM_RETRIES = REGISTRY.register(
+    Counter(
+        "downstream_retries_total",
+        "Attempts of the downstream requests after the first one",
+        ["downstream"],
+    )
+)
+DOWNSTREAM_FAILURES = REGISTRY.register(
+    Counter(
+        "downstream_failures_total",
+        "Downstream requests given up",
+        ["downstream"],
+    )
+)
+BATCH_SIZE = REGISTRY.register(
+    Histogram(
+        "batch_size",
+        "Number of ids of the batches sent to a downstream",
+        ["loader"],
+        buckets=BATCH_SIZE_BUCKETS,
+    )
+)
+CACHE_LOOKUPS = REGISTRY.register(
+    Counter(
+        "cache_lookups_total",
+        "Cache lookups by result (hit, stale or miss)",
+        ["cache", "result"],
+    )
+)
@@ -0,0 +1,93 @@
+import base64
+import hashlib
+import os
+from array import array
+from typing import List, NamedTuple, Optional
+
+from app.cache import CacheBackend, TTLCache, create_cache_backend
+
+# How long the clients can keep paging through the same ids list
+SNAPSHOT_TTL = float(os.getenv("SNAPSHOT_TTL", "1800"))
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class Cursor(NamedTuple):
+    """Position in an ids list snapshot, opaque for the clients"""
+
+    snapshot_id: str
+    offset: int
+
+    def encode(self) -> str:
+        token = f"{self.snapshot_id}:{self.offset}".encode()
+        return base64.urlsafe_b64encode(token).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "Cursor":
+        try:
+            data = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            snapshot_id, offset = data.decode().split(":")
+            return cls(snapshot_id, int(offset))
+        except ValueError:
+            raise InvalidCursor(f"Invalid cursor {token!r}")
+
+
+def pack_ids(ids: List[int]) -> str:
+    """Compact form of an ids list: its machine array, base64 encoded"""
+    try:
+        packed = array("I", ids)
+    except OverflowError:
+        packed = array("q", ids)
+
+    return packed.typecode + base64.b64encode(packed.tobytes()).decode()
+
+
+def unpack_ids(data: str) -> List[int]:
+    packed = array(data[0])
+    packed.frombytes(base64.b64decode(data[1:]))
+
+    return packed.tolist()
+
+
+class SnapshotStore:
+    """Snapshots of ids lists, so every page of a listing uses the same list
+
+    Snapshots are identified by their content, the same list is stored once
+    and stored again only when half of its TTL is over.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float = SNAPSHOT_TTL) -> None:
+        self.backend = backend
+        self.ttl = ttl
+        self._saved = TTLCache(maxsize=1024, ttl=ttl / 2)
+
+    async def save(self, ids: List[int]) -> str:
+        data = pack_ids(ids)
+        snapshot_id = hashlib.blake2b(data.encode(), digest_size=8).hexdigest()
+        if snapshot_id not in self._saved:
+            await self.backend.set_many({snapshot_id: data}, ttl=self.ttl)
+            self._saved.set(snapshot_id, True)
+
+        return snapshot_id
+
+    async def load(self, snapshot_id: str) -> Optional[List[int]]:
+        """Return the snapshot ids, None if it expired"""
+        data = (await self.backend.get_many([snapshot_id])).get(snapshot_id)
+
+        return None if data is None else unpack_ids(data)
+
+    async def clear(self) -> None:
+        await self.backend.clear()
+        self._saved.clear()
+
+
+ID_SNAPSHOTS = SnapshotStore(
+    create_cache_backend(
+        "snapshot",
+        ttl=SNAPSHOT_TTL,
+        maxsize=1000,
+        max_bytes=int(os.getenv("SNAPSHOT_MAX_BYTES", str(32 * 1024 * 1024))),
+    )
+)
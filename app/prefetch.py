@@ -0,0 +1,86 @@
+import asyncio
+import os
+from typing import Awaitable, Callable, Set
+
+from structlog import get_logger
+
+logger = get_logger()
+
+# Warm up the cache with the next page after answering a /movies request
+PREFETCH_NEXT_PAGE = os.getenv("PREFETCH_NEXT_PAGE", "0") == "1"
+PREFETCH_MAX_CONCURRENCY = int(os.getenv("PREFETCH_MAX_CONCURRENCY", "4"))
+# Above this number of /movies requests in flight prefetching stops
+PREFETCH_MAX_LOAD = int(os.getenv("PREFETCH_MAX_LOAD", "50"))
+PREFETCH_DEADLINE = float(os.getenv("PREFETCH_DEADLINE", "10"))
+
+
+class Prefetcher:
+    """Run best-effort background warm-ups without hurting real requests
+
+    At most `max_concurrency` warm-ups run at the same time, the others are
+    dropped. When more than `max_load` requests are in flight the running
+    warm-ups are cancelled and no new one is started.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = PREFETCH_MAX_CONCURRENCY,
+        max_load: int = PREFETCH_MAX_LOAD,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_load = max_load
+        self.load = 0
+        self._tasks: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    @property
+    def overloaded(self) -> bool:
+        return self.load > self.max_load
+
+    def request_started(self) -> None:
+        self.load += 1
+        if self.overloaded and self._tasks:
+            logger.info("Prefetch cancelled under load", load=self.load)
+            self.cancel()
+
+    def request_finished(self) -> None:
+        self.load -= 1
+
+    def track_request(self) -> Callable[[], None]:
+        """Count a request in flight until the returned callback is called,
+        calling it again has no effect"""
+        self.request_started()
+        finished = False
+
+        def request_finished() -> None:
+            nonlocal finished
+            if not finished:
+                finished = True
+                self.request_finished()
+
+        return request_finished
+
+    def schedule(self, warm_up: Callable[[], Awaitable]) -> bool:
+        """Start warm_up in background, return if it was started"""
+        if self.overloaded or len(self._tasks) >= self.max_concurrency:
+            return False
+
+        task = asyncio.ensure_future(warm_up())
+        self._tasks.add(task)
+        task.add_done_callback(self._done)
+
+        return True
+
+    def _done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Prefetch failed", error=repr(task.exception()))
+
+    def cancel(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+
+
+PREFETCHER = Prefetcher()
@@ -0,0 +1,57 @@
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+# Default (and maximum) time budget of a /movies request, shared by all its
+# downstream calls. Requests can ask for a tighter one with `?deadline=`
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "10"))
+
+
+class Deadline:
+    """Point in time after which no more downstream calls should be made"""
+
+    def __init__(self, timeout: Optional[float] = None) -> None:
+        self.expires_at = None if timeout is None else time.monotonic() + timeout
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left until the deadline, None if there's no deadline"""
+        if self.expires_at is None:
+            return None
+
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() == 0.0
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How many times and how often a downstream request is retried
+
+    Retries wait an exponential backoff with full jitter
+    (`uniform(0, min(backoff_max, backoff_base * 2 ** attempt))`) and every
+    attempt is bounded by `attempt_timeout` and by the request deadline.
+    """
+
+    max_attempts: int = 5
+    backoff_base: float = 0.05
+    backoff_max: float = 1.0
+    attempt_timeout: float = 2.0
+
+    def backoff(self, attempt: int) -> float:
+        """Seconds to wait after the given (zero based) attempt failed"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def timeout(self, deadline: Optional[Deadline] = None) -> float:
+        """Timeout of the next attempt, never past the deadline"""
+        remaining = deadline.remaining() if deadline else None
+        if remaining is None:
+            return self.attempt_timeout
+
+        return min(self.attempt_timeout, remaining)
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
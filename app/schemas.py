@@ -1,8 +1,13 @@
+import os
+
 from pydantic import BaseModel
 from typing import Optional, List
 
 from pydantic.fields import Field
 
+# Max number of queries of a /movies/batch request
+MAX_BATCH_QUERIES = int(os.getenv("MAX_BATCH_QUERIES", "20"))
+
 
 class CastMember(BaseModel):
     id: str = Field(..., example="3896")
@@ -27,3 +32,14 @@ class Movie(BaseModel):
         None, example=["Adventure", "Action", "Science Fiction"]
     )
     cast: Optional[List[CastMember]]
+
+
+class MoviesQuery(BaseModel):
+    genre: Optional[str] = Field(None, example="Action")
+    offset: int = Field(0, ge=0, example=0)
+    limit: int = Field(10, gt=0, example=10)
+
+
+class MoviesBatchInput(BaseModel):
+    queries: List[MoviesQuery] = Field(..., min_items=1, max_items=MAX_BATCH_QUERIES)
+    deadline: Optional[float] = Field(None, gt=0, example=2.5)
@@ -1,52 +1,396 @@
-from typing import Iterable, List, Optional
+import asyncio
+import functools
+import time
+from contextlib import AsyncExitStack
+from dataclasses import dataclass
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
 from typing_extensions import TypedDict
-import requests
+import httpx
 from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse, unquote
 from app.entities import Genre
-from app.entities import GENRES_MAP, GENDERS_MAP
+from app.entities import GENDERS_MAP, GENRES_BY_NAME, GENRES_MAP, GENRES_POSITION
 from structlog import get_logger
+from app.log import LOG_MAX_FIELD_LENGTH, Lazy
+from app.tracing import span
+from app.metrics import (
+    CACHE_LOOKUPS,
+    DOWNSTREAM_ATTEMPTS,
+    DOWNSTREAM_FAILURES,
+    DOWNSTREAM_REQUEST_DURATION,
+    DOWNSTREAM_RETRIES,
+    MOVIES_ERRORS,
+)
 from app.entities import Error
 from datetime import date
 from app.schemas import CastMember, Movie
+from app.cache import (
+    ARTIST_CACHE,
+    ARTIST_CACHE_NEGATIVE_TTL,
+    MOVIE_DETAILS_CACHE,
+    MOVIES_IDS_CACHE,
+    CacheBackend,
+    StaleWhileRevalidateCache,
+)
+from app.client import (
+    ARTIST_INFO_FLIGHTS,
+    MOVIE_INFO_FLIGHTS,
+    MOVIE_SEARCH_FLIGHTS,
+    SingleFlight,
+)
+from app.loader import (
+    ARTIST_INFO_LOADER,
+    MOVIE_INFO_LOADER,
+    BatchFunction,
+    BatchLoader,
+)
+from app.pagination import ID_SNAPSHOTS, Cursor, SnapshotStore
+from app.retry import DEFAULT_RETRY_POLICY, Deadline, RetryPolicy
+from app.settings import ARTIST_INFO, MOVIE_INFO, MOVIE_SEARCH, DownstreamSettings
+from app.balancer import (
+    ARTIST_INFO_BALANCER,
+    MOVIE_INFO_BALANCER,
+    MOVIE_SEARCH_BALANCER,
+    LoadBalancer,
+)
+from app.breaker import ARTIST_INFO_BREAKER, MOVIE_INFO_BREAKER, CircuitBreaker
+from app.hedging import (
+    ARTIST_INFO_HEDGE_POLICY,
+    MOVIE_INFO_HEDGE_POLICY,
+    HedgePolicy,
+    hedged_request,
+)
 
 logger = get_logger()
 
 
+class DownstreamError(Exception):
+    """A downstream service couldn't answer within the retry policy"""
+
+
+# genre, offset and limit of a page of movies
+PageQuery = Tuple[Optional[Genre], int, int]
+
+
+@dataclass
+class Page:
+    """A page of `MovieService.list_many`"""
+
+    movies: List[Movie]
+    total: int
+    next_cursor: Optional[str]
+    errors: Optional[List[Error]]
+
+
 class BaseService:
-    def __init__(self, client: requests) -> None:
+    # Max number of requests a service instance keeps in flight at the same time
+    MAX_CONCURRENCY = 5
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        max_concurrency: Optional[int] = None,
+        semaphore: Optional[asyncio.Semaphore] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        deadline: Optional[Deadline] = None,
+        count_errors: bool = True,
+    ) -> None:
         self.client = client
         self.errors: Optional[List[Error]] = None
+        # NOTE: off for the services whose errors reach no response (prefetch)
+        self.count_errors = count_errors
+        self.max_concurrency = max_concurrency or self.MAX_CONCURRENCY
+        self._semaphore = semaphore
+        # NOTE: None follows the retry policy of each downstream settings
+        self.retry_policy = retry_policy
+        self.deadline = deadline or Deadline()
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # NOTE: created lazily so it is bound to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        return self._semaphore
+
+    async def _request(
+        self,
+        path: str,
+        settings: DownstreamSettings,
+        balancer: LoadBalancer,
+        hedge_policy: Optional[HedgePolicy] = None,
+        deadline: Optional[Deadline] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        """GET the path from the replicas of the downstream following its
+        settings and the deadline"""
+        started = time.perf_counter()
+        with span(settings.name, path=path):
+            response = await self.request_until_status_code_is_200(
+                self.client,
+                path,
+                self.retry_policy or settings.retry_policy,
+                deadline or self.deadline,
+                self.semaphore,
+                hedge_policy,
+                breaker,
+                settings.in_flight(),
+                balancer,
+                settings.name,
+            )
+        DOWNSTREAM_REQUEST_DURATION.observe(
+            time.perf_counter() - started, downstream=settings.name
+        )
+        if response is None:
+            DOWNSTREAM_FAILURES.inc(downstream=settings.name)
+
+        return response
+
+    async def _wait_within_deadline(
+        self, shared: Awaitable, deadline: Optional[Deadline] = None
+    ):
+        """Await the shared call no longer than the deadline, the one of the
+        service by default, raising asyncio.TimeoutError
+
+        Shared flights and batches serve requests with different deadlines, so
+        they run without one, bounded only by the retry policy, and only the
+        wait of each request is bounded by its deadline. The call keeps
+        running in background to fill the cache.
+        """
+        task = asyncio.ensure_future(shared)
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(task), (deadline or self.deadline).remaining()
+            )
+        except asyncio.TimeoutError:
+            # NOTE: retrieve the outcome so a late failure isn't reported as
+            # a never retrieved exception
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            raise
+
+    async def _fetch_within_deadline(
+        self,
+        flights: SingleFlight,
+        loader: BatchLoader,
+        ids: List[str],
+        fetch_batch: BatchFunction,
+    ) -> dict:
+        """Load the ids in batches through the flights, waiting for them no
+        longer than the deadline
+
+        Each batch is awaited on its own, the ids of the batches that didn't
+        answer in time are returned as failed (None) along with the values
+        of the others.
+        """
+        if not ids:
+            return {}
+
+        # Ids already requested by a concurrent call are awaited, not requested
+        futures = flights.start_many(ids, lambda own: loader.load_each(own, fetch_batch))
+        done, _ = await asyncio.wait(
+            set(futures.values()), timeout=self.deadline.remaining()
+        )
+
+        late = [key for key, future in futures.items() if future not in done]
+        if late:
+            logger.warning("Deadline exceeded waiting for ids", ids=late)
+
+        fetched = dict.fromkeys(late)
+        for key, future in futures.items():
+            if future in done:
+                fetched.update(future.result())
+
+        return fetched
 
     def _add_error(self, error: Error) -> None:
+        if self.count_errors:
+            MOVIES_ERRORS.inc(code=str(error["errorCode"]))
         if self.errors is None:
             self.errors = [error]
         else:
             self.errors.append(error)
 
     @staticmethod
-    def request_until_status_code_is_200(client, url) -> dict:
-        status_code = None
+    async def request_until_status_code_is_200(
+        client,
+        url,
+        retry_policy: RetryPolicy = DEFAULT_RETRY_POLICY,
+        deadline: Optional[Deadline] = None,
+        semaphore: Optional[asyncio.Semaphore] = None,
+        hedge_policy: Optional[HedgePolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        in_flight: Optional[asyncio.Semaphore] = None,
+        balancer: Optional[LoadBalancer] = None,
+        downstream: str = "",
+    ):
+        """GET the url until it answers 200 or the retry policy gives up
+
+        Every attempt is hedged when a hedge_policy is given and recorded in
+        the breaker, if any. Both the request `semaphore` and the downstream
+        `in_flight` one bound the attempts. With a balancer the url is a path
+        and every attempt (and hedge) is sent to a replica picked by it,
+        retries preferring the replicas not tried yet. The attempts are
+        counted by outcome for the `downstream`. Returns None when every
+        attempt failed, the deadline is over or the circuit is open.
+        """
+        deadline = deadline or Deadline()
+        tried: Set[str] = set()
 
-        while status_code != 200:
-            response = client.get(url)
-            if (status_code := response.status_code) == 200:
+        for attempt in range(retry_policy.max_attempts):
+            timeout = retry_policy.timeout(deadline)
+            if timeout <= 0:
                 break
+            if breaker is not None and not breaker.allow():
+                logger.warning("Circuit open", url=unquote(url), breaker=breaker.name)
+                DOWNSTREAM_ATTEMPTS.inc(downstream=downstream, outcome="circuit_open")
+                return None
+            if attempt:
+                DOWNSTREAM_RETRIES.inc(downstream=downstream)
+
+            response = await BaseService._attempt(
+                lambda: BaseService._get_once(
+                    client,
+                    url,
+                    timeout,
+                    semaphore,
+                    hedge_policy,
+                    in_flight,
+                    balancer,
+                    tried,
+                ),
+                url,
+                attempt,
+                breaker,
+                downstream,
+                clipped=timeout < retry_policy.attempt_timeout,
+            )
+            if response is not None and response.status_code == 200:
+                logger.info(
+                    "Response Sucessfull",
+                    url=Lazy(lambda: unquote(url)),
+                    status_code=response.status_code,
+                    # NOTE: only what survives the truncation, never the
+                    # parsed body (e.g. every id of a genre)
+                    response=Lazy(
+                        lambda: response.text[: LOG_MAX_FIELD_LENGTH or None]
+                    ),
+                )
+                return response
+
+            if attempt + 1 < retry_policy.max_attempts:
+                backoff = retry_policy.backoff(attempt)
+                remaining = deadline.remaining()
+                if remaining is not None and remaining <= backoff:
+                    break
+                await asyncio.sleep(backoff)
 
+        logger.error("Request gave up", url=unquote(url))
+        return None
+
+    @staticmethod
+    async def _attempt(
+        get: Callable[[], Awaitable],
+        url,
+        attempt: int,
+        breaker: Optional[CircuitBreaker] = None,
+        downstream: str = "",
+        clipped: bool = False,
+    ):
+        """Make an attempt, counting it by outcome and recording it in the
+        breaker, if any. Returns its response, None if it failed to get one
+
+        `clipped` attempts had less than the attempt timeout because of the
+        caller's deadline, their timeouts are not the service's fault.
+        """
+        try:
+            response = await get()
+        except (asyncio.TimeoutError, httpx.TransportError) as exc:
+            logger.error("Request Error", url=url, attempt=attempt, error=repr(exc))
+            timed_out = isinstance(exc, asyncio.TimeoutError)
+            DOWNSTREAM_ATTEMPTS.inc(
+                downstream=downstream,
+                outcome="timeout" if timed_out else "transport_error",
+            )
+            if breaker is not None:
+                if timed_out and clipped:
+                    breaker.release()
+                else:
+                    breaker.record_failure()
+            return None
+        except asyncio.CancelledError:
+            # NOTE: an abandoned half-open trial must not keep the circuit
+            # waiting for its outcome
+            if breaker is not None:
+                breaker.record_failure()
+            raise
+        except Exception as exc:
+            # e.g. an invalid response or too many redirects
+            logger.error("Request Error", url=url, attempt=attempt, error=repr(exc))
+            DOWNSTREAM_ATTEMPTS.inc(downstream=downstream, outcome="error")
+            if breaker is not None:
+                breaker.record_failure()
+            raise
+
+        DOWNSTREAM_ATTEMPTS.inc(
+            downstream=downstream, outcome=str(response.status_code)
+        )
+        if breaker is not None:
+            if response.status_code < 500:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+
+        if response.status_code != 200:
             logger.error(
                 "Response Error",
-                status_code=status_code,
+                status_code=response.status_code,
                 url=url,
+                attempt=attempt,
                 response=response.text,
             )
 
-        logger.info(
-            "Response Sucessfull",
-            url=unquote(url),
-            status_code=status_code,
-            response=response.json(),
-        )
         return response
 
+    @staticmethod
+    async def _get_once(
+        client,
+        url,
+        timeout,
+        semaphore=None,
+        hedge_policy=None,
+        in_flight=None,
+        balancer=None,
+        tried=None,
+    ):
+        async def get():
+            async with AsyncExitStack() as stack:
+                for limit in (semaphore, in_flight):
+                    if limit is not None:
+                        await stack.enter_async_context(limit)
+                if balancer is None:
+                    return await client.get(url)
+
+                replica = balancer.pick(tried or ())
+                if tried is not None:
+                    tried.add(replica.url)
+                return await balancer.request(
+                    replica, lambda: client.get(f"{replica.url}{url}")
+                )
+
+        if hedge_policy is None:
+            return await asyncio.wait_for(get(), timeout)
+
+        return await asyncio.wait_for(hedged_request(get, hedge_policy), timeout)
+
     @staticmethod
     def get_details_url(ids: List[int], url) -> str:  # TYPING: str[URL]
         query_params = BaseService.build_id_query_params(ids)
@@ -70,25 +414,15 @@ class BaseService:
     @staticmethod
     def add_query_params_to_url(url: str, query_params: dict) -> str:
         """Add query_params dict to the url"""
-        url_parts = list(urlparse(url))
-        query = dict(parse_qsl(url_parts[4]))
-        query.update(query_params)
-        url_parts[4] = urlencode(query)
+        base, query, fragment = url_template(url)
+        query_string = urlencode({**query, **query_params})
 
-        return urlunparse(url_parts)
+        return f"{base}?{query_string}{fragment}" if query_string else base + fragment
 
     @staticmethod
     def split_list_with_max_length(list_, max_length) -> List[List[int]]:
-        new_list: list = []
-
-        while list_:
-            new_list.append(list_[:max_length])
-            for _ in range(max_length):
-                if not list_:
-                    break
-                list_.pop(0)
-
-        return new_list
+        """Chunks of up to max_length items, list_ is left untouched"""
+        return [list_[i : i + max_length] for i in range(0, len(list_), max_length)]
 
     @staticmethod
     def filter(
@@ -104,6 +438,21 @@ class BaseService:
 
 
 class MovieService(BaseService):
+    search_settings: DownstreamSettings = MOVIE_SEARCH
+    details_settings: DownstreamSettings = MOVIE_INFO
+    search_balancer: LoadBalancer = MOVIE_SEARCH_BALANCER
+    details_balancer: LoadBalancer = MOVIE_INFO_BALANCER
+    # Opt-in hedging of the movie-info requests
+    details_hedge_policy: Optional[HedgePolicy] = MOVIE_INFO_HEDGE_POLICY
+    details_cache: CacheBackend = MOVIE_DETAILS_CACHE
+    ids_cache: StaleWhileRevalidateCache = MOVIES_IDS_CACHE
+    search_flights: SingleFlight = MOVIE_SEARCH_FLIGHTS
+    details_flights: SingleFlight = MOVIE_INFO_FLIGHTS
+    details_loader: BatchLoader = MOVIE_INFO_LOADER
+    # Skips movie-info while it's down, the movies are built without details
+    details_breaker: Optional[CircuitBreaker] = MOVIE_INFO_BREAKER
+    snapshots: SnapshotStore = ID_SNAPSHOTS
+
     class MovieDetailsResponse(TypedDict):
         id: str
         title: Optional[str]
@@ -113,19 +462,175 @@ class MovieService(BaseService):
         genres: Optional[List[int]]
         cast: Optional[List[int]]
 
-    def list(
-        self, genre: Optional[Genre], offset: Optional[int], limit: Optional[int]
-    ) -> tuple[List[Movie], int]:
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # Cursor and movies ids of the page following the listed one, if any
+        self.next_cursor: Optional[str] = None
+        self.next_ids: Optional[List[int]] = None
+        # Errors of each movie, to report them by page, see `list_many`
+        self.movie_errors: Dict[str, List[Error]] = {}
+
+    async def list(
+        self,
+        genre: Optional[Genre],
+        offset: Optional[int],
+        limit: Optional[int],
+        cursor: Optional[Cursor] = None,
+    ) -> Tuple[List[Movie], int]:
         """Given a genre list movies"""
-        movies_ids = self.list_ids(genre)
-        total = len(movies_ids)
-        movies_ids = self.filter(movies_ids, offset, limit)
-        movies = self.get_details(movies_ids)
+        movies_ids, total = await self.list_page_ids(genre, offset, limit, cursor)
+        with span("details", movies=len(movies_ids)):
+            movies = await self.get_details(movies_ids)
 
         return movies, total
 
-    def list_ids(self, genre: Optional[Genre] = None) -> List[int]:
-        url = "http://localhost:3040/movies"
+    async def list_many(self, queries: List[PageQuery]) -> List[Page]:
+        """List the pages of several queries with a single fan-out
+
+        The ids of every page are listed first (movie-search is called once
+        by genre), then the details and cast of the movies of all the pages
+        are fetched at once, so the movies and artists shared by several
+        pages are requested only once. Each page gets the errors of its own
+        movies, or a 503 error if its ids can't be listed. Raises the
+        DownstreamError when no ids list can be.
+        """
+
+        async def page_ids(query: PageQuery) -> Tuple[MovieService, List[int], int]:
+            service = MovieService(
+                self.client, retry_policy=self.retry_policy, deadline=self.deadline
+            )
+            movies_ids, total = await service.list_page_ids(*query)
+            return service, movies_ids, total
+
+        listed = await asyncio.gather(
+            *(page_ids(query) for query in queries), return_exceptions=True
+        )
+        for result in listed:
+            if isinstance(result, BaseException) and not isinstance(
+                result, DownstreamError
+            ):
+                raise result
+        if all(isinstance(result, DownstreamError) for result in listed):
+            raise listed[0]
+
+        unique_ids = list(
+            dict.fromkeys(
+                mid
+                for result in listed
+                if not isinstance(result, DownstreamError)
+                for mid in result[1]
+            )
+        )
+        with span("details", movies=len(unique_ids)):
+            movies = await self.get_details(unique_ids) if unique_ids else []
+        movies_by_id = {movie.id: movie for movie in movies}
+
+        pages = []
+        for result in listed:
+            if isinstance(result, DownstreamError):
+                error = Error(errorCode=503, message=str(result))
+                pages.append(Page(movies=[], total=0, next_cursor=None, errors=[error]))
+                continue
+
+            service, movies_ids, total = result
+            pages.append(
+                Page(
+                    movies=[
+                        movies_by_id[str(mid)]
+                        for mid in movies_ids
+                        if str(mid) in movies_by_id
+                    ],
+                    total=total,
+                    next_cursor=service.next_cursor,
+                    errors=self.page_errors(movies_ids),
+                )
+            )
+
+        return pages
+
+    def page_errors(self, movies_ids: List[int]) -> Optional[List[Error]]:
+        """Errors of the given movies, as `list` reports them for their page"""
+        errors = [
+            error for mid in movies_ids for error in self.movie_errors.get(str(mid), ())
+        ]
+        # NOTE: the missing details are found before the incomplete casts
+        errors.sort(key=lambda error: error["errorCode"] != 450)
+        return errors or None
+
+    async def list_page_ids(
+        self,
+        genre: Optional[Genre],
+        offset: Optional[int],
+        limit: Optional[int],
+        cursor: Optional[Cursor] = None,
+    ) -> Tuple[List[int], int]:
+        """Given a genre return the movies ids of the page and the total
+
+        The next page cursor points to a snapshot of the ids list, so the
+        following pages skip movie-search and are stable. If the snapshot
+        expired the current ids list is used.
+        """
+        movies_ids = None
+        with span("list_ids"):
+            if cursor:
+                offset = cursor.offset
+                movies_ids = await self.snapshots.load(cursor.snapshot_id)
+                if movies_ids is None:
+                    logger.warning("Snapshot expired", snapshot_id=cursor.snapshot_id)
+
+            if movies_ids is None:
+                snapshot_id = None
+                movies_ids = await self.list_ids(genre)
+            else:
+                snapshot_id = cursor.snapshot_id
+
+        total = len(movies_ids)
+        if limit and (offset or 0) + limit < total:
+            snapshot_id = snapshot_id or await self.snapshots.save(movies_ids)
+            self.next_cursor = Cursor(snapshot_id, (offset or 0) + limit).encode()
+            self.next_ids = self.filter(movies_ids, (offset or 0) + limit, limit)
+
+        return self.filter(movies_ids, offset, limit), total
+
+    async def stream_details(self, movies_ids: List[int]) -> AsyncIterator[Movie]:
+        """Yield the movies as soon as their details and cast are assembled
+
+        Every movie is fetched on its own, the batch loaders still group the
+        ids in full batches. Movies are yielded in completion order, the ones
+        still pending are cancelled if the generator is closed.
+        """
+        tasks = [asyncio.ensure_future(self.get_details([mid])) for mid in movies_ids]
+        try:
+            for movies in asyncio.as_completed(tasks):
+                for movie in await movies:
+                    yield movie
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def prefetch(self, movies_ids: List[int]) -> None:
+        """Warm up the details and cast caches with the given movies"""
+        await self.get_details(movies_ids)
+        logger.info("Movies prefetched", movies=movies_ids, errors=self.errors)
+
+    async def list_ids(self, genre: Optional[Genre] = None) -> List[int]:
+        """Given a genre return its movies ids, served from the ids cache
+
+        Once cached, stale lists are refreshed in background (outside of the
+        request deadline) so the request never waits on movie-search.
+        """
+        return await self.ids_cache.get(
+            genre["name"] if genre else "",
+            fetch=lambda: self._request_ids(genre),
+            revalidate=lambda: self._request_ids(genre, Deadline()),
+        )
+
+    async def _request_ids(
+        self, genre: Optional[Genre], deadline: Optional[Deadline] = None
+    ) -> List[int]:
+        """Given a genre return its movies ids, waiting for them until the
+        deadline, the one of the service by default"""
+        url = "/movies"
         query_params = {}
 
         if genre:
@@ -134,54 +639,111 @@ class MovieService(BaseService):
         if query_params:
             url = self.add_query_params_to_url(url, query_params)
 
-        logger.info("GET movies ids", url=unquote(url))
-        response = self.request_until_status_code_is_200(self.client, url)
+        logger.info("GET movies ids", url=Lazy(lambda: unquote(url)))
+        # Concurrent requests of the same genre share a single call, see
+        # _wait_within_deadline
+        flight = self.search_flights.do(
+            url,
+            lambda: self._request(
+                url,
+                self.search_settings,
+                self.search_balancer,
+                deadline=Deadline(),
+            ),
+        )
+        try:
+            response = await self._wait_within_deadline(flight, deadline)
+        except asyncio.TimeoutError:
+            response = None
+        if response is None:
+            raise DownstreamError(f"Movies ids can not be retrieved from {url}")
 
         return response.json()["data"]
 
+    def _add_movie_error(self, mid, error: Error) -> None:
+        self._add_error(error)
+        self.movie_errors.setdefault(str(mid), []).append(error)
+
     def _handle_missing_details(self, movies: List[int]) -> List[MovieDetailsResponse]:
         logger.warning(
             f"Movies id's : #{movies} detail info is not completed", movies=movies
         )
         details = []
         for mid in movies:
-            self._add_error(
+            self._add_movie_error(
+                mid,
                 Error(
                     errorCode=450,
                     message=f"Movie id #{mid} details can not be retrieved",
-                )
+                ),
             )
             details.append(self.MovieDetailsResponse(id=mid))
 
         return details
 
-    def get_details(self, movies_ids: List[int]) -> List[Movie]:
+    async def get_details(self, movies_ids: List[int]) -> List[Movie]:
         """Given a list of movies id's returns a list with movies details.
 
-        If cloudn't get some of the movies details build without it and add error
-        missing information
+        Details found in the cache are not requested again, the missing ones are
+        requested in batches concurrently (bounded by the service concurrency
+        cap). If cloudn't get some of the movies details, or they weren't ready
+        before the deadline, build without it and add error missing information
         """
-        movies_list: list = []
+        cached = await self.details_cache.get_many(str(mid) for mid in movies_ids)
+        missing_ids = [str(mid) for mid in movies_ids if str(mid) not in cached]
+        record_lookups(self.details_cache, len(cached), len(missing_ids))
+
+        fetched = await self._fetch_within_deadline(
+            self.details_flights, self.details_loader, missing_ids, self._fetch_batch
+        )
+
+        failed_ids = [mid for mid in missing_ids if mid in fetched and not fetched[mid]]
+        if failed_ids:
+            fetched.update(zip(failed_ids, self._handle_missing_details(failed_ids)))
 
-        for movies_batch in self.split_list_with_max_length(movies_ids, 5):
-            details = self._request_details(movies_batch)
-            if not details:
-                details = self._handle_missing_details(movies_batch)
+        details: list = []
+        for mid in map(str, movies_ids):
+            if mid in cached:
+                details.append(cached[mid])
+            elif mid in fetched:
+                details.append(fetched.pop(mid))
+        # Details of ids that weren't asked for but movie-info answered anyway
+        details += fetched.values()
 
-            movies_detail_batch = self._build_details_from_response(details)
-            movies_list += movies_detail_batch
+        return await self._build_details_from_response(details)
 
-        return movies_list
+    async def _fetch_batch(
+        self, movies_batch: List[str]
+    ) -> Dict[str, Optional[MovieDetailsResponse]]:
+        """Request the details of a batch and cache them
 
-    def _request_details(
+        Returns the details by id, None for every id if the batch failed.
+        """
+        batch_details = await self._request_details(movies_batch)
+        if not batch_details:
+            return dict.fromkeys(movies_batch)
+
+        fetched = {str(res["id"]): res for res in batch_details}
+        await self.details_cache.set_many(fetched)
+        return fetched
+
+    async def _request_details(
         self, movies_ids: List[int]
     ) -> Optional[List[MovieDetailsResponse]]:
         """Given a list on movies ids return their details"""
-        url = self.get_details_url(movies_ids, "http://localhost:3030/movies")
-        logger.info("GET movies details", url=unquote(url))
-        response = self.client.get(url)
+        url = self.get_details_url(movies_ids, "/movies")
+        logger.info("GET movies details", url=Lazy(lambda: unquote(url)))
+        # NOTE: the batch is shared by the requests, see _wait_within_deadline
+        response = await self._request(
+            url,
+            self.details_settings,
+            self.details_balancer,
+            self.details_hedge_policy,
+            deadline=Deadline(),
+            breaker=self.details_breaker,
+        )
 
-        if response.status_code == 200:
+        if response is not None:
             return [
                 self.MovieDetailsResponse(
                     id=movie_res["id"],
@@ -195,30 +757,58 @@ class MovieService(BaseService):
                 for movie_res in response.json()["data"]
             ]
 
-    def _build_details_from_response(
+    async def _get_page_cast(
+        self, response: List[MovieDetailsResponse]
+    ) -> Tuple[Dict[str, CastMember], Set[str]]:
+        """Fetch the cast of every movie of the page at once.
+
+        The cast ids are de-duplicated across movies so shared artists are
+        requested only once and the batches sent to artist-info are full.
+        Returns the members by id and the ids that couldn't be retrieved.
+        """
+        cast_ids = list(
+            dict.fromkeys(cid for res in response for cid in res.get("cast") or [])
+        )
+        if not cast_ids:
+            return {}, set()
+
+        cast_service = CastService(
+            self.client,
+            retry_policy=self.retry_policy,
+            deadline=self.deadline,
+            count_errors=self.count_errors,
+        )
+        cast = await cast_service.get_details(cast_ids)
+
+        members = {member.id: member for member in cast or []}
+        return members, cast_service.failed_ids
+
+    async def _build_details_from_response(
         self, response: List[MovieDetailsResponse]
     ) -> List[Movie]:
+        with span("cast"):
+            members, failed_ids = await self._get_page_cast(response)
+
         movies_details: List[Movie] = []
         for res in response:
             mid = res["id"]
+            cast_ids = [str(cid) for cid in res.get("cast") or []]
 
-            cast = None
-            if cast_ids := res.get("cast"):
-                cast_service = CastService(self.client)
-                cast = cast_service.get_details(cast_ids)
-
-            if not cast or cast_service.errors:
+            cast = [members[cid] for cid in cast_ids if cid in members] or None
+            if not cast or not failed_ids.isdisjoint(cast_ids):
                 message = f"Movie id #{mid} cast info is not complete"
-                self._add_error(
+                self._add_movie_error(
+                    mid,
                     Error(
                         errorCode=440,
                         message=message,
-                    )
+                    ),
                 )
                 logger.warning(message, id=mid, cast_ids=cast_ids)
 
-            movie = Movie(
-                id=mid,
+            # NOTE: built with the output types, skipping the pydantic validation
+            movie = Movie.construct(
+                id=str(mid),
                 title=res.get("title"),
                 releaseYear=date.fromisoformat(res["releaseDate"]).year
                 if res.get("releaseDate")
@@ -236,45 +826,136 @@ class MovieService(BaseService):
 
         return movies_details
 
+
 class CastService(BaseService):
-    def get_details(self, cast_ids: List[int]) -> Optional[List[CastMember]]:
-        cast: list = []
-        for cast_batch_ids in self.split_list_with_max_length(cast_ids, 5):
-            url = self.get_details_url(cast_batch_ids, "http://localhost:3050/artists")
-            response = self.client.get(url)
-
-            if response.status_code == 200:
-                cast += [
-                    CastMember(
-                        id=member["id"],
-                        gender=GENDERS_MAP[int(member["gender"])],
-                        name=member["name"],
-                        profilePath=member["profilePath"],
-                    )
-                    for member in response.json()["data"]
-                ]
-            else:
-                logger.warning(
-                    "Cast details request failed",
-                    url=unquote(url),
-                    status_code=response.status_code,
-                    response=response.text,
-                )
-                self._add_error(
-                    Error(
-                        errorCode=460,
-                        message=f"Cast id's #{cast_batch_ids} details info is not complete",
-                    )
+    settings: DownstreamSettings = ARTIST_INFO
+    balancer: LoadBalancer = ARTIST_INFO_BALANCER
+    # Opt-in hedging of the artist-info requests
+    hedge_policy: Optional[HedgePolicy] = ARTIST_INFO_HEDGE_POLICY
+    # Artists by id, None for the ids artist-info doesn't know
+    cache: CacheBackend = ARTIST_CACHE
+    negative_ttl: float = ARTIST_CACHE_NEGATIVE_TTL
+    flights: SingleFlight = ARTIST_INFO_FLIGHTS
+    loader: BatchLoader = ARTIST_INFO_LOADER
+    # Skips artist-info while it's down, the movies are built without cast
+    breaker: Optional[CircuitBreaker] = ARTIST_INFO_BREAKER
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # Ids of the batches artist-info failed to answer
+        self.failed_ids: Set[str] = set()
+
+    async def get_details(self, cast_ids: List[int]) -> Optional[List[CastMember]]:
+        """Given a list of artists id's returns their details
+
+        Artists found in the cache are not requested again, including the ones
+        artist-info reported as missing (negative entries, kept for a shorter
+        time), so the batches are built only from the real misses.
+        """
+        cached = await self.cache.get_many(str(cid) for cid in cast_ids)
+        missing_ids = [str(cid) for cid in cast_ids if str(cid) not in cached]
+        record_lookups(self.cache, len(cached), len(missing_ids))
+
+        fetched = await self._fetch_within_deadline(
+            self.flights, self.loader, missing_ids, self._fetch_batch
+        )
+
+        failed_ids = [cid for cid in missing_ids if cid in fetched and not fetched[cid]]
+        self.failed_ids.update(failed_ids)
+        for cast_batch_ids in self.split_list_with_max_length(
+            failed_ids, self.settings.batch_size
+        ):
+            self._add_error(
+                Error(
+                    errorCode=460,
+                    message=f"Cast id's #{cast_batch_ids} details info is not complete",
                 )
+            )
+
+        cast: list = []
+        for cid in map(str, cast_ids):
+            if cached.get(cid) is not None:
+                cast.append(CastMember.construct(**cached[cid]))
+            elif fetched.get(cid) is not None:
+                cast.append(fetched.pop(cid))
+        # Artists that weren't asked for but artist-info answered anyway
+        cast += [
+            member
+            for cid, member in fetched.items()
+            if member is not None and cid not in missing_ids
+        ]
 
         return cast or None
 
+    async def _fetch_batch(
+        self, cast_batch_ids: List[str]
+    ) -> Dict[str, Optional[CastMember]]:
+        """Request the artists of a batch and cache them, the ids artist-info
+        doesn't know as negative entries
+
+        Returns the artists by id, None for every id if the batch failed.
+        """
+        url = self.get_details_url(cast_batch_ids, "/artists")
+        # NOTE: the batch is shared by the requests, see _wait_within_deadline
+        response = await self._request(
+            url,
+            self.settings,
+            self.balancer,
+            self.hedge_policy,
+            deadline=Deadline(),
+            breaker=self.breaker,
+        )
+
+        if response is None:
+            logger.warning("Cast details request failed", url=unquote(url))
+            return dict.fromkeys(cast_batch_ids)
+
+        fetched = {
+            str(member["id"]): CastMember.construct(
+                id=str(member["id"]),
+                gender=GENDERS_MAP[int(member["gender"])],
+                name=member["name"],
+                profilePath=member["profilePath"],
+            )
+            for member in response.json()["data"]
+        }
+        await self.cache.set_many(
+            {cid: member.dict() for cid, member in fetched.items()}
+        )
+        await self.cache.set_many(
+            dict.fromkeys(cid for cid in cast_batch_ids if cid not in fetched),
+            ttl=self.negative_ttl,
+        )
+        return fetched
+
+
+def record_lookups(cache: CacheBackend, hits: int, misses: int) -> None:
+    CACHE_LOOKUPS.inc(hits, cache=cache.namespace, result="hit")
+    CACHE_LOOKUPS.inc(misses, cache=cache.namespace, result="miss")
+
+
+@functools.lru_cache(maxsize=256)
+def url_template(url: str) -> Tuple[str, Dict[str, str], str]:
+    """The url without its query and fragment, its query params and its
+    fragment, parsed once by url
+
+    NOTE: the query params dict is shared, don't update it.
+    """
+    url_parts = urlparse(url)
+    base = urlunparse(url_parts._replace(query="", fragment=""))
+    fragment = f"#{url_parts.fragment}" if url_parts.fragment else ""
+
+    return base, dict(parse_qsl(url_parts.query)), fragment
+
 
 def get_genre(name: str) -> Optional[Genre]:
-    for genre in GENRES_MAP:
-        if name == genre["name"]:
-            return Genre(id=genre["id"], name=genre["name"])
+    """NOTE: the genres are shared, don't update them"""
+    return GENRES_BY_NAME.get(name)
 
 
 def get_genres_names_from_list(ids_list: List[int]) -> Optional[List[Genre.__name__]]:
-    return [genre["name"] for genre in GENRES_MAP if genre["id"] in ids_list]
+    """Names of the known genres of ids_list, in the GENRES_MAP order"""
+    positions = sorted(
+        {GENRES_POSITION[gid] for gid in ids_list if gid in GENRES_POSITION}
+    )
+    return [GENRES_MAP[position]["name"] for position in positions]
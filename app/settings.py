@@ -0,0 +1,102 @@
+import asyncio
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Tuple
+from weakref import WeakKeyDictionary
+
+from app.retry import DEFAULT_RETRY_POLICY, RetryPolicy
+
+# Optional JSON object with the same keys as the environment variables below,
+# e.g. {"MOVIE_INFO_URLS": "http://movie-info:3030", "MOVIE_INFO_BATCH_SIZE": 10}.
+# The environment variables take precedence over the file.
+SETTINGS_FILE = os.getenv("SETTINGS_FILE")
+
+
+def _load_settings_file(path) -> dict:
+    if not path:
+        return {}
+
+    with open(path) as settings_file:
+        return json.load(settings_file)
+
+
+_FILE_SETTINGS = _load_settings_file(SETTINGS_FILE)
+
+
+def get_setting(name: str, default: Any) -> str:
+    """Setting from the environment, the settings file or the default"""
+    return str(os.getenv(name, _FILE_SETTINGS.get(name, default)))
+
+
+@dataclass(frozen=True)
+class DownstreamSettings:
+    """How a downstream service is reached
+
+    The requests are balanced across the `urls` of its replicas, see
+    `LoadBalancer` for the ejection settings. `max_in_flight` caps the
+    requests in flight to the downstream across the whole process, while
+    `BaseService.max_concurrency` caps the ones of a single request.
+    """
+
+    name: str
+    urls: Tuple[str, ...]
+    batch_size: int = 5
+    max_in_flight: int = 40
+    retry_policy: RetryPolicy = DEFAULT_RETRY_POLICY
+    eject_after: int = 3
+    eject_time: float = 10.0
+    slow_threshold: float = 1.0
+    _semaphores: WeakKeyDictionary = field(
+        default_factory=WeakKeyDictionary, init=False, repr=False, compare=False
+    )
+
+    def in_flight(self) -> asyncio.Semaphore:
+        # NOTE: asyncio primitives are bound to the event loop using them, so
+        # there is one semaphore per running loop
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.max_in_flight)
+
+        return self._semaphores[loop]
+
+
+def downstream_settings(prefix: str, url: str) -> DownstreamSettings:
+    """Settings of a downstream read from `<prefix>_*` settings
+
+    `<prefix>_URLS` is a comma separated list of base URLs.
+    """
+    return DownstreamSettings(
+        name=prefix.lower().replace("_", "-"),
+        urls=tuple(
+            u.strip().rstrip("/")
+            for u in get_setting(f"{prefix}_URLS", url).split(",")
+            if u.strip()
+        ),
+        batch_size=int(get_setting(f"{prefix}_BATCH_SIZE", 5)),
+        max_in_flight=int(get_setting(f"{prefix}_MAX_IN_FLIGHT", 40)),
+        retry_policy=RetryPolicy(
+            max_attempts=int(
+                get_setting(f"{prefix}_MAX_ATTEMPTS", DEFAULT_RETRY_POLICY.max_attempts)
+            ),
+            backoff_base=float(
+                get_setting(f"{prefix}_BACKOFF_BASE", DEFAULT_RETRY_POLICY.backoff_base)
+            ),
+            backoff_max=float(
+                get_setting(f"{prefix}_BACKOFF_MAX", DEFAULT_RETRY_POLICY.backoff_max)
+            ),
+            attempt_timeout=float(
+                get_setting(
+                    f"{prefix}_ATTEMPT_TIMEOUT", DEFAULT_RETRY_POLICY.attempt_timeout
+                )
+            ),
+        ),
+        eject_after=int(get_setting(f"{prefix}_EJECT_AFTER", 3)),
+        eject_time=float(get_setting(f"{prefix}_EJECT_TIME", 10)),
+        slow_threshold=float(get_setting(f"{prefix}_SLOW_THRESHOLD", 1)),
+    )
+
+
+MOVIE_SEARCH = downstream_settings("MOVIE_SEARCH", "http://localhost:3040")
+MOVIE_INFO = downstream_settings("MOVIE_INFO", "http://localhost:3030")
+ARTIST_INFO = downstream_settings("ARTIST_INFO", "http://localhost:3050")
@@ -1,13 +1,35 @@
+import asyncio
 import pytest
 from typing import List
 from app.schemas import CastMember
 from fastapi.testclient import TestClient
 from app.main import app
+from app.breaker import ARTIST_INFO_BREAKER, MOVIE_INFO_BREAKER
+from app.cache import ARTIST_CACHE, MOVIE_DETAILS_CACHE, MOVIES_IDS_CACHE
+from app.pagination import ID_SNAPSHOTS
+from app.retry import RetryPolicy
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    yield
+    for cache in (MOVIE_DETAILS_CACHE, ARTIST_CACHE, MOVIES_IDS_CACHE, ID_SNAPSHOTS):
+        asyncio.run(cache.clear())
+
+
+@pytest.fixture(autouse=True)
+def reset_breakers():
+    yield
+    for breaker in (MOVIE_INFO_BREAKER, ARTIST_INFO_BREAKER):
+        if breaker is not None:
+            breaker.reset()
 
 
 @pytest.fixture
 def client() -> TestClient:
-    return TestClient(app)
+    # NOTE: used as context manager so the startup/shutdown events are run
+    with TestClient(app) as client:
+        yield client
 
 @pytest.fixture
 def movies_ids() -> List[int]:
@@ -21,4 +43,8 @@ def vin_disiel() -> CastMember:
         gender="Male",
         name="Vin Disiel",
         profilePath="www",
-    )
\ No newline at end of file
+    )
+
+@pytest.fixture
+def single_attempt() -> RetryPolicy:
+    return RetryPolicy(max_attempts=1)
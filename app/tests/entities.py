@@ -1,3 +1,5 @@
+import asyncio
+import time
 from typing import Optional, List
 
 
@@ -20,7 +22,7 @@ class FakeRequestClient:
         self.data = None
         self.called = 0
 
-    def get(self, url: str, data: Optional[dict] = None) -> FakeResponse:
+    async def get(self, url: str, data: Optional[dict] = None) -> FakeResponse:
         self.url = url
         self.data = data
         self.called += 1
@@ -30,3 +32,96 @@ class FakeRequestClient:
         )
 
         return response
+
+
+class SlowFakeRequestClient(FakeRequestClient):
+    """Fake client that takes `delay` seconds to answer and tracks concurrency"""
+
+    def __init__(self, responses: List[FakeResponse] = None, delay: float = 0.01):
+        super().__init__(responses)
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def get(self, url: str, data: Optional[dict] = None) -> FakeResponse:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            return await super().get(url, data)
+        finally:
+            self.in_flight -= 1
+
+
+class FakeRedisServer:
+    """Local stand-in speaking the subset of RESP used by the RedisBackend"""
+
+    def __init__(self) -> None:
+        self.data: dict = {}
+        self.commands: List[tuple] = []
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"redis://{host}:{port}/1"
+
+    async def start(self) -> "FakeRedisServer":
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def stop(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    @staticmethod
+    def _encode(value) -> bytes:
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, list):
+            return b"*%d\r\n" % len(value) + b"".join(
+                FakeRedisServer._encode(v) for v in value
+            )
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def _get(self, key: bytes):
+        value, expires_at = self.data.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.data.pop(key)
+            return None
+        return value
+
+    def _run(self, command: str, args: List[bytes]) -> bytes:
+        if command == "SELECT":
+            return b"+OK\r\n"
+        if command == "MGET":
+            return self._encode([self._get(key) for key in args])
+        if command == "SET":
+            key, value, *options = args
+            expires_at = None
+            if options and options[0].upper() == b"PX":
+                expires_at = time.monotonic() + int(options[1]) / 1000
+            self.data[key] = (value, expires_at)
+            return b"+OK\r\n"
+        if command == "KEYS":
+            prefix = args[0].rstrip(b"*")
+            return self._encode([k for k in self.data if k.startswith(prefix)])
+        if command == "DEL":
+            return self._encode(sum(self.data.pop(k, None) is not None for k in args))
+        return b"-ERR unknown command\r\n"
+
+    async def _handle(self, reader, writer) -> None:
+        try:
+            while line := await reader.readline():
+                args = []
+                for _ in range(int(line[1:-2])):
+                    length = int((await reader.readline())[1:-2])
+                    args.append((await reader.readexactly(length + 2))[:-2])
+                command = args[0].decode().upper()
+                self.commands.append((command, *args[1:]))
+                writer.write(self._run(command, args[1:]))
+                await writer.drain()
+        finally:
+            writer.close()
@@ -1,3 +1,5 @@
+import json
+
 from app.services import MovieService
 from app.tests.entities import FakeRequestClient, FakeResponse
 from app.tests.movies_details_example import (
@@ -17,8 +19,7 @@ def test__list_movies(mocker, client):
         responses=[
             FakeResponse(status_code=200, response={"data": MOVIES_IDS}),
             FakeResponse(status_code=200, response={"data": MOVIES_DETAILS_RAW}),
-            FakeResponse(status_code=200, response={"data": CAST_RAW[0]}),
-            FakeResponse(status_code=200, response={"data": CAST_RAW[1]}),
+            FakeResponse(status_code=200, response={"data": CAST_RAW[0] + CAST_RAW[1]}),
         ]
     )
 
@@ -29,6 +30,94 @@ def test__list_movies(mocker, client):
     assert response.status_code == 200
     assert response.json() == {
         "data": {"movies": MOVIES_DETAILS_COMPLETED},
-        "metadata": {"offset": offset, "limit": total, "total": total},
+        "metadata": {
+            "offset": offset,
+            "limit": total,
+            "total": total,
+            "nextCursor": None,
+        },
         "errors": None,
     }
+    # movie-search, movie-info and a single artist-info call for the whole page
+    assert fake_client.called == 3
+    timings = [t.split(";")[0] for t in response.headers["Server-Timing"].split(", ")]
+    assert timings == [
+        "movies",
+        "list_ids",
+        "movie-search",
+        "details",
+        "movie-info",
+        "cast",
+        "artist-info",
+    ]
+
+
+def test__list_movies__ndjson(mocker, client):
+    fake_client = FakeRequestClient(
+        responses=[
+            FakeResponse(status_code=200, response={"data": MOVIES_IDS}),
+            FakeResponse(status_code=200, response={"data": MOVIES_DETAILS_RAW}),
+            FakeResponse(status_code=200, response={"data": CAST_RAW[0] + CAST_RAW[1]}),
+        ]
+    )
+
+    mocker.patch("app.main.MovieService", return_value=MovieService(fake_client))
+
+    response = client.get(
+        "/movies?genre=Action", headers={"Accept": "application/x-ndjson"}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    *movies, trailer = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(movies, key=lambda m: m["id"]) == sorted(
+        MOVIES_DETAILS_COMPLETED, key=lambda m: m["id"]
+    )
+    assert trailer == {
+        "metadata": {
+            "offset": 0,
+            "limit": len(MOVIES_IDS),
+            "total": len(MOVIES_IDS),
+            "nextCursor": None,
+        },
+        "errors": None,
+    }
+    # the loaders still group the per movie requests
+    assert fake_client.called == 3
+
+
+def test__list_movies_batch(mocker, client):
+    fake_client = FakeRequestClient(
+        responses=[
+            FakeResponse(status_code=200, response={"data": MOVIES_IDS}),
+            FakeResponse(status_code=200, response={"data": MOVIES_DETAILS_RAW}),
+            FakeResponse(status_code=200, response={"data": CAST_RAW[0] + CAST_RAW[1]}),
+        ]
+    )
+
+    mocker.patch("app.main.MovieService", return_value=MovieService(fake_client))
+
+    response = client.post(
+        "/movies/batch",
+        json={
+            "queries": [
+                {"genre": "Action"},
+                {"genre": "Action", "offset": 1, "limit": 1},
+            ]
+        },
+    )
+
+    assert response.status_code == 200
+    first, second = response.json()["results"]
+    assert first["data"]["movies"] == MOVIES_DETAILS_COMPLETED
+    assert first["metadata"]["total"] == len(MOVIES_IDS)
+    assert first["errors"] is None
+    assert second["data"]["movies"] == MOVIES_DETAILS_COMPLETED[1:]
+    assert second["metadata"] == {
+        "offset": 1,
+        "limit": 1,
+        "total": len(MOVIES_IDS),
+        "nextCursor": None,
+    }
+    # a single movie-search, movie-info and artist-info call for both queries
+    assert fake_client.called == 3
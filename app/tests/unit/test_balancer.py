@@ -0,0 +1,57 @@
+import asyncio
+
+from app.balancer import LoadBalancer
+from app.tests.entities import FakeResponse
+
+
+def test__LoadBalancer__pick__least_outstanding_of_two():
+    balancer = LoadBalancer(["http://a", "http://b"])
+    busy, idle = balancer.replicas
+    busy.outstanding = 3
+
+    assert {balancer.pick().url for _ in range(20)} == {idle.url}
+
+
+def test__LoadBalancer__pick__prefers_replicas_not_tried():
+    balancer = LoadBalancer(["http://a", "http://b", "http://c"])
+
+    picked = {balancer.pick(tried={"http://a", "http://b"}).url for _ in range(20)}
+
+    assert picked == {"http://c"}
+
+
+def test__LoadBalancer__request__ejects_failing_replica():
+    balancer = LoadBalancer(["http://a", "http://b"], eject_after=2)
+    sick, healthy = balancer.replicas
+
+    async def fail():
+        return FakeResponse(status_code=500)
+
+    async def run():
+        for _ in range(2):
+            await balancer.request(sick, fail)
+
+    asyncio.run(run())
+
+    assert sick.outstanding == 0
+    assert {balancer.pick().url for _ in range(20)} == {healthy.url}
+
+
+def test__LoadBalancer__request__ejects_slow_replica():
+    balancer = LoadBalancer(["http://a", "http://b"], eject_after=1, slow_threshold=0)
+    slow, healthy = balancer.replicas
+
+    async def succeed():
+        return FakeResponse(status_code=200)
+
+    asyncio.run(balancer.request(slow, succeed))
+
+    assert {balancer.pick().url for _ in range(20)} == {healthy.url}
+
+
+def test__LoadBalancer__pick__every_replica_ejected():
+    balancer = LoadBalancer(["http://a", "http://b"])
+    for replica in balancer.replicas:
+        replica.ejected_until = float("inf")
+
+    assert balancer.pick().url in ("http://a", "http://b")
@@ -0,0 +1,60 @@
+import asyncio
+import random
+
+import pytest
+
+from benchmarks import helpers
+from benchmarks.run import percentile, run_scenario
+from benchmarks.stubs import Catalog, parse_latency
+
+
+def test__percentile():
+    values = list(range(1, 101))
+
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    assert percentile([], 50) is None
+
+
+@pytest.mark.parametrize(
+    "spec,low,high",
+    (
+        ("fixed:0.1", 0.1, 0.1),
+        ("uniform:0.1,0.2", 0.1, 0.2),
+        ("lognormal:0.1,0.5", 0, 10),
+    ),
+)
+def test__parse_latency(spec, low, high):
+    latency = parse_latency(spec)
+
+    assert low <= latency(random.Random(0)) <= high
+
+
+def test__parse_latency__invalid():
+    with pytest.raises(ValueError):
+        parse_latency("normal:1")
+
+
+def test__Catalog__generate_is_reproducible():
+    assert Catalog.generate(100, 50, seed=1) == Catalog.generate(100, 50, seed=1)
+
+
+def test__run_scenario__ideal():
+    result = asyncio.run(run_scenario("ideal", requests=5, concurrency=2))
+
+    assert result["statuses"] == {200: 5}
+    assert result["partial_responses"] == 0
+    assert result["downstream"]["movie-info"]["rejected"] == 0
+    assert result["latency_ms"]["p50"] <= result["latency_ms"]["p99"]
+
+
+def test__helpers__run():
+    results = helpers.run(ids=50, repeat=1)
+
+    assert set(results) == {
+        "split_list_with_max_length",
+        "add_query_params_to_url",
+        "get_genre",
+        "get_genres_names_from_list",
+    }
@@ -0,0 +1,96 @@
+import time
+
+from app.breaker import CircuitBreaker, breaker_from_env
+
+
+def test__CircuitBreaker__opens_at_failure_rate():
+    breaker = CircuitBreaker("test", failure_rate=0.5, min_requests=4)
+
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test__CircuitBreaker__needs_min_requests():
+    breaker = CircuitBreaker("test", min_requests=4)
+
+    for _ in range(3):
+        breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test__CircuitBreaker__forgets_outcomes_out_of_the_window():
+    breaker = CircuitBreaker("test", window=0.01, min_requests=2)
+
+    breaker.record_failure()
+    time.sleep(0.02)
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test__CircuitBreaker__half_open_trial_closes():
+    breaker = CircuitBreaker("test", min_requests=1, cool_down=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    # a single trial at a time
+    assert not breaker.allow()
+
+    breaker.record_success()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test__CircuitBreaker__half_open_trial_reopens():
+    breaker = CircuitBreaker("test", min_requests=1, cool_down=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow()
+
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test__breaker_from_env(monkeypatch):
+    monkeypatch.setenv("TEST_BREAKER_COOL_DOWN", "1.5")
+
+    assert breaker_from_env("TEST").cool_down == 1.5
+
+    monkeypatch.setenv("TEST_BREAKER", "0")
+
+    assert breaker_from_env("TEST") is None
+
+
+def test__CircuitBreaker__release_half_open_trial():
+    breaker = CircuitBreaker("test", min_requests=1, cool_down=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow()
+
+    breaker.release()
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+
+
+def test__CircuitBreaker__stale_half_open_trial_is_given_up():
+    breaker = CircuitBreaker("test", min_requests=1, cool_down=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    time.sleep(0.02)
+
+    assert breaker.allow()
@@ -0,0 +1,159 @@
+import asyncio
+import time
+
+from app.cache import (
+    CacheBackend,
+    MemoryBackend,
+    RedisBackend,
+    SQLiteBackend,
+    StaleWhileRevalidateCache,
+    TTLCache,
+)
+from app.tests.entities import FakeRedisServer
+
+
+def test__TTLCache__get_and_set():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", {"id": 1})
+
+    assert cache.get("a") == {"id": 1}
+    assert cache.get("b") is None
+    assert cache.get_many(["a", "b"]) == {"a": {"id": 1}}
+
+
+def test__TTLCache__expired_entries_are_missing():
+    cache = TTLCache(maxsize=10, ttl=0.01)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=60)
+    time.sleep(0.02)
+
+    assert "a" not in cache
+    assert cache.get_many(["a", "b"]) == {"b": 2}
+    assert len(cache) == 1
+
+
+def test__TTLCache__evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get_many(["a", "b", "c"]) == {"a": 1, "c": 3}
+
+
+def test__TTLCache__bounded_by_memory():
+    cache = TTLCache(maxsize=100, ttl=60, max_bytes=10, sizeof=len)
+    cache.set("a", "aaaa")
+    cache.set("b", "bbbb")
+    cache.set("c", "cccc")
+    cache.set("too-big", "x" * 11)
+
+    assert cache.get_many(["a", "b", "c", "too-big"]) == {"b": "bbbb", "c": "cccc"}
+    assert cache.bytes == 8
+
+
+def test__StaleWhileRevalidateCache__serves_stale_and_refreshes_in_background():
+    cache = StaleWhileRevalidateCache(MemoryBackend(), fresh_ttl=0, stale_ttl=60)
+    values = iter([1, 2, 3])
+    calls = []
+
+    async def fetch():
+        calls.append("fetch")
+        return next(values)
+
+    async def run():
+        first = await cache.get("key", fetch)
+        stale = await cache.get("key", fetch)
+        # a single refresh is scheduled for the same key
+        await cache.get("key", fetch)
+        await asyncio.sleep(0.01)
+        refreshed = await cache.get("key", fetch)
+        await asyncio.sleep(0.01)
+        return first, stale, refreshed
+
+    assert asyncio.run(run()) == (1, 1, 2)
+    assert calls == ["fetch"] * 3
+
+
+def test__StaleWhileRevalidateCache__fresh_value_is_not_refreshed():
+    cache = StaleWhileRevalidateCache(MemoryBackend(), fresh_ttl=60, stale_ttl=60)
+    calls = []
+
+    async def fetch():
+        calls.append("fetch")
+        return [1, 2]
+
+    async def run():
+        return [await cache.get("key", fetch) for _ in range(3)]
+
+    assert asyncio.run(run()) == [[1, 2]] * 3
+    assert calls == ["fetch"]
+
+
+async def check_backend(backend: CacheBackend):
+    assert await backend.get_many([]) == {}
+    await backend.set_many({"1": {"id": 1, "name": "Neo"}, "2": None, "3": [1, 2]})
+    await backend.set_many({"4": "expired"}, ttl=0.01)
+    await asyncio.sleep(0.02)
+
+    assert await backend.get_many(["1", "2", "3", "4", "5"]) == {
+        "1": {"id": 1, "name": "Neo"},
+        "2": None,
+        "3": [1, 2],
+    }
+
+    await backend.clear()
+    assert await backend.get_many(["1", "2", "3"]) == {}
+
+
+def test__MemoryBackend():
+    asyncio.run(check_backend(MemoryBackend("movie")))
+
+
+def test__SQLiteBackend__shared_between_processes(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    asyncio.run(check_backend(SQLiteBackend(path, "movie")))
+
+    async def run():
+        worker_1 = SQLiteBackend(path, "movie")
+        worker_2 = SQLiteBackend(path, "movie")
+        other_namespace = SQLiteBackend(path, "artist")
+        await worker_1.set_many({"1": {"id": 1}})
+        return (
+            await worker_2.get_many(["1"]),
+            await other_namespace.get_many(["1"]),
+        )
+
+    assert asyncio.run(run()) == ({"1": {"id": 1}}, {})
+
+
+def test__RedisBackend():
+    async def run():
+        server = await FakeRedisServer().start()
+        backend = RedisBackend(server.url, "movie")
+        try:
+            await check_backend(backend)
+            await backend.set_many({"1": 1, "2": 2})
+            await backend.get_many(["1", "2"])
+        finally:
+            await backend.close()
+            await server.stop()
+        return server
+
+    server = asyncio.run(run())
+
+    # a single round trip for bulk operations
+    assert server.commands[0] == ("SELECT", b"1")
+    assert server.commands[-1] == ("MGET", b"movie:1", b"movie:2")
+    assert server.commands[-3][:2] == ("SET", b"movie:1")
+
+
+def test__RedisBackend__server_down_is_a_miss():
+    backend = RedisBackend("redis://127.0.0.1:1/0", "movie")
+
+    async def run():
+        await backend.set_many({"1": 1})
+        return await backend.get_many(["1"])
+
+    assert asyncio.run(run()) == {}
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from app.client import SingleFlight
+
+
+def test__SingleFlight__do__concurrent_callers_share_the_call():
+    flights = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append("fetch")
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def run():
+        return await asyncio.gather(*[flights.do("key", fetch) for _ in range(5)])
+
+    assert asyncio.run(run()) == ["result"] * 5
+    assert calls == ["fetch"]
+    assert len(flights) == 0
+
+
+def test__SingleFlight__do__error_is_shared():
+    flights = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise ValueError("downstream error")
+
+    async def run():
+        return await asyncio.gather(
+            flights.do("key", fetch), flights.do("key", fetch), return_exceptions=True
+        )
+
+    errors = asyncio.run(run())
+    assert [type(error) for error in errors] == [ValueError, ValueError]
+
+
+def test__SingleFlight__do__cancelled_caller_doesnt_cancel_the_call():
+    flights = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "result"
+
+    async def run():
+        first = asyncio.ensure_future(flights.do("key", fetch))
+        second = asyncio.ensure_future(flights.do("key", fetch))
+        await asyncio.sleep(0.005)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == "result"
+
+
+def test__SingleFlight__do_many__only_fetches_keys_not_in_flight():
+    flights = SingleFlight()
+    calls = []
+
+    async def fetch(keys):
+        calls.append(keys)
+        await asyncio.sleep(0.01)
+        # "3" is unknown downstream, "extra" wasn't asked for
+        return {key: key * 2 for key in keys if key != "3"} | {"extra": "x"}
+
+    async def run():
+        first = asyncio.ensure_future(flights.do_many(["1", "2"], fetch))
+        await asyncio.sleep(0)
+        second = await flights.do_many(["2", "3", "1"], fetch)
+        return await first, second
+
+    first, second = asyncio.run(run())
+
+    assert calls == [["1", "2"], ["3"]]
+    assert first == {"1": "11", "2": "22", "extra": "x"}
+    assert second == {"1": "11", "2": "22", "extra": "x"}
+    assert len(flights) == 0
+
+
+def test__SingleFlight__do_many__error_is_shared():
+    flights = SingleFlight()
+
+    async def fetch(keys):
+        await asyncio.sleep(0.01)
+        raise ValueError("downstream error")
+
+    async def run():
+        first = asyncio.ensure_future(flights.do_many(["1"], fetch))
+        await asyncio.sleep(0)
+        with pytest.raises(ValueError):
+            await flights.do_many(["1"], fetch)
+        with pytest.raises(ValueError):
+            await first
+
+    asyncio.run(run())
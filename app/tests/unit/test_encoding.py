@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from app import encoding
+from app.encoding import FastJSONResponse, dumps
+from app.schemas import CastMember, Movie
+
+
+@pytest.fixture(params=("orjson", "json"))
+def encoder(request, mocker):
+    if request.param == "json":
+        mocker.patch.object(encoding, "orjson", None)
+    elif encoding.orjson is None:
+        pytest.skip("orjson isn't installed")
+
+
+def test__dumps__constructed_models(encoder):
+    movie = Movie.construct(
+        id="1",
+        title="Amélie",
+        releaseYear=2001,
+        revenue=None,
+        posterPath=None,
+        genres=["Comedy"],
+        cast=[
+            CastMember.construct(id="2", gender="Female", name="Audrey", profilePath="www")
+        ],
+    )
+
+    encoded = dumps({"movies": [movie], "errors": None})
+
+    assert json.loads(encoded) == {
+        "movies": [Movie.parse_obj(movie.dict()).dict()],
+        "errors": None,
+    }
+    assert b"\\u" not in encoded
+
+
+def test__dumps__not_serializable(encoder):
+    with pytest.raises(TypeError):
+        dumps({"value": object()})
+
+
+def test__FastJSONResponse__render():
+    response = FastJSONResponse({"data": [Movie.construct(id="1")]})
+
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == {"data": [Movie(id="1").dict()]}
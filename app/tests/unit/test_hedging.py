@@ -0,0 +1,94 @@
+import asyncio
+
+from app.hedging import HedgePolicy, hedged_request
+from app.tests.entities import FakeResponse
+
+
+class ScriptedGet:
+    """Each call answers the next (delay, status_code) of the script"""
+
+    def __init__(self, script) -> None:
+        self.script = list(script)
+        self.called = 0
+        self.cancelled = 0
+
+    async def __call__(self) -> FakeResponse:
+        delay, status_code = self.script[self.called]
+        self.called += 1
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return FakeResponse(response=self.called, status_code=status_code)
+
+
+def test__hedged_request__fast_response_is_not_hedged():
+    get = ScriptedGet([(0, 200)])
+    policy = HedgePolicy(delay=0.05, max_ratio=1)
+
+    response = asyncio.run(hedged_request(get, policy))
+
+    assert response.status_code == 200
+    assert get.called == 1
+    assert policy.hedges == 0
+
+
+def test__hedged_request__slow_response_is_hedged_and_cancelled():
+    get = ScriptedGet([(1, 200), (0, 200)])
+    policy = HedgePolicy(delay=0.01, max_ratio=1)
+
+    response = asyncio.run(hedged_request(get, policy))
+
+    assert response.json() == 2
+    assert get.called == 2
+    assert get.cancelled == 1
+    assert policy.hedges == 1
+
+
+def test__hedged_request__hedge_wins_when_first_request_fails():
+    get = ScriptedGet([(0.02, 500), (0.04, 200)])
+    policy = HedgePolicy(delay=0, max_ratio=1)
+
+    response = asyncio.run(hedged_request(get, policy))
+
+    assert response.status_code == 200
+    assert get.called == 2
+
+
+def test__hedged_request__failure_without_hedge_is_returned():
+    get = ScriptedGet([(0, 500)])
+    policy = HedgePolicy(delay=0.05, max_ratio=1)
+
+    response = asyncio.run(hedged_request(get, policy))
+
+    assert response.status_code == 500
+    assert get.called == 1
+
+
+def test__hedged_request__extra_load_is_capped():
+    get = ScriptedGet([(0.02, 200)] * 8)
+    policy = HedgePolicy(delay=0, max_ratio=0.5)
+
+    async def run():
+        return [await hedged_request(get, policy) for _ in range(4)]
+
+    asyncio.run(run())
+
+    assert policy.requests == 4
+    assert policy.hedges == 2
+    assert get.called == 6
+
+
+def test__HedgePolicy__quiet_periods_do_not_build_up_hedges():
+    policy = HedgePolicy(delay=0.05, max_ratio=0.1, burst=2)
+    for _ in range(1000):
+        policy.record_request()
+
+    hedges = 0
+    for _ in range(100):
+        policy.record_request()
+        hedges += policy.acquire_hedge()
+
+    # the burst saved during the fast requests, then up to 10% of the slow ones
+    assert hedges == 11
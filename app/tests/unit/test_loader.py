@@ -0,0 +1,75 @@
+import asyncio
+
+from app.loader import BatchLoader
+
+
+class FakeBatchFunction:
+    def __init__(self, fail: bool = False) -> None:
+        self.batches = []
+        self.fail = fail
+
+    async def __call__(self, keys):
+        self.batches.append(keys)
+        await asyncio.sleep(0)
+        if self.fail:
+            raise ValueError("downstream error")
+        return {key: key.upper() for key in keys if key != "unknown"}
+
+
+def test__BatchLoader__keys_of_concurrent_requests_fill_batches():
+    loader = BatchLoader(max_batch_size=5, window=0.01)
+    batch_fn = FakeBatchFunction()
+
+    async def run():
+        return await asyncio.gather(
+            loader.load_many(["a", "b"], batch_fn),
+            loader.load_many(["c", "b", "d"], batch_fn),
+            loader.load_many(["e", "f", "unknown"], batch_fn),
+        )
+
+    first, second, third = asyncio.run(run())
+
+    assert batch_fn.batches == [["a", "b", "c", "d", "e"], ["f", "unknown"]]
+    assert first == {"a": "A", "b": "B"}
+    assert second == {"c": "C", "b": "B", "d": "D"}
+    assert third == {"e": "E", "f": "F"}
+
+
+def test__BatchLoader__partial_batch_is_sent_after_the_window():
+    loader = BatchLoader(max_batch_size=5, window=0.01)
+    batch_fn = FakeBatchFunction()
+
+    async def run():
+        task = asyncio.ensure_future(loader.load_many(["a"], batch_fn))
+        await asyncio.sleep(0.001)
+        assert batch_fn.batches == []
+        return await task
+
+    assert asyncio.run(run()) == {"a": "A"}
+    assert batch_fn.batches == [["a"]]
+
+
+def test__BatchLoader__error_is_shared_by_the_batch():
+    loader = BatchLoader(max_batch_size=5, window=0.001)
+    batch_fn = FakeBatchFunction(fail=True)
+
+    async def run():
+        return await asyncio.gather(
+            loader.load_many(["a"], batch_fn),
+            loader.load_many(["b"], batch_fn),
+            return_exceptions=True,
+        )
+
+    errors = asyncio.run(run())
+
+    assert [type(error) for error in errors] == [ValueError, ValueError]
+    assert batch_fn.batches == [["a", "b"]]
+
+
+def test__BatchLoader__values_not_asked_for_are_returned():
+    loader = BatchLoader(max_batch_size=5, window=0.001)
+
+    async def batch_fn(keys):
+        return {"other": 1}
+
+    assert asyncio.run(loader.load_many(["a"], batch_fn)) == {"other": 1}
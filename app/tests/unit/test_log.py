@@ -0,0 +1,83 @@
+import io
+import json
+import threading
+
+import pytest
+import structlog
+
+from app.log import (
+    Lazy,
+    QueueWriter,
+    capture_context,
+    parse_sampling,
+    resolve_lazy,
+    sample,
+    truncate,
+)
+
+
+def test__parse_sampling():
+    assert parse_sampling("Response Sucessfull=0.01, GET movies ids=0.5") == {
+        "Response Sucessfull": 0.01,
+        "GET movies ids": 0.5,
+    }
+    assert parse_sampling("") == {}
+
+
+def test__sample(mocker):
+    processor = sample({"noisy": 0.1})
+    mocker.patch("app.log.random.random", return_value=0.5)
+
+    with pytest.raises(structlog.DropEvent):
+        processor(None, "info", {"event": "noisy"})
+    assert processor(None, "info", {"event": "other"}) == {"event": "other"}
+
+
+def test__truncate():
+    processor = truncate(5)
+
+    event_dict = processor(
+        None, "info", {"event": "a long event", "url": "0123456789", "ids": [1, 2, 3]}
+    )
+
+    assert event_dict == {
+        "event": "a long event",
+        "url": "01234...(5 more chars)",
+        "ids": "[1, 2...(4 more chars)",
+    }
+
+
+def test__QueueWriter__writes_in_background():
+    stream = io.StringIO()
+    writer = QueueWriter(
+        [resolve_lazy, structlog.processors.JSONRenderer()], stream=stream
+    )
+    threads = []
+
+    def response():
+        threads.append(threading.current_thread().name)
+        return {"data": [1, 2]}
+
+    writer.put(
+        capture_context(
+            None, "info", {"event": "Response", "response": Lazy(response)}
+        )
+    )
+    writer.flush()
+    writer.stop()
+
+    line = json.loads(stream.getvalue())
+    assert line["event"] == "Response"
+    assert line["level"] == "info"
+    assert line["response"] == {"data": [1, 2]}
+    assert threads == ["log-writer"]
+
+
+def test__QueueWriter__drops_when_full(mocker):
+    writer = QueueWriter([structlog.processors.JSONRenderer()], maxsize=1)
+    mocker.patch.object(writer, "_start")
+
+    writer.put({"event": "first", "level": "info"})
+    writer.put({"event": "second", "level": "info"})
+
+    assert writer.dropped == 1
@@ -1,4 +1,11 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app import prefetch
+from app.main import app
+from app.retry import REQUEST_DEADLINE
 from app.schemas import CastMember, Movie
+from app.services import DownstreamError
 
 
 def test__list_movies(mocker, client):
@@ -94,10 +101,166 @@ def test__list_movies(mocker, client):
                 },
             ]
         },
-        "metadata": {"offset": offset, "limit": limit, "total": total},
+        "metadata": {
+            "offset": offset,
+            "limit": limit,
+            "total": total,
+            "nextCursor": None,
+        },
         "errors": None,
     }
 
 
 def test__health_check(client):
-    assert client.get("/").status_code == 200
\ No newline at end of file
+    assert client.get("/").status_code == 200
+
+def test__http_client__shared_for_the_application_lifetime(mocker):
+    service = mocker.patch("app.main.MovieService")
+    service.return_value.list = mocker.AsyncMock(return_value=([], 0))
+    service.return_value.errors = None
+    service.return_value.next_cursor = None
+
+    with TestClient(app) as client:
+        http_client = app.state.http_client
+        client.get("/movies")
+        client.get("/movies")
+
+        assert not http_client.is_closed
+        assert [call.args[0] for call in service.call_args_list] == [
+            http_client,
+            http_client,
+        ]
+
+    assert http_client.is_closed
+
+
+def test__list_movies__movie_search_unavailable(mocker, client):
+    mocker.patch(
+        "app.services.MovieService.list",
+        side_effect=DownstreamError("Movies ids can not be retrieved"),
+    )
+
+    response = client.get("/movies?genre=Action")
+
+    assert response.status_code == 503
+    assert response.json() == {"detail": "Movies ids can not be retrieved"}
+
+
+def test__list_movies__invalid_cursor(client):
+    response = client.get("/movies?cursor=not-a-cursor")
+
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize(
+    "query,budget",
+    (
+        ("", REQUEST_DEADLINE),
+        ("&deadline=0.5", 0.5),
+        ("&deadline=999", REQUEST_DEADLINE),
+    ),
+)
+def test__list_movies__deadline(mocker, client, query, budget):
+    mocker.patch("app.services.MovieService.list", return_value=([], 0))
+    deadline = mocker.patch("app.main.Deadline")
+
+    response = client.get(f"/movies?genre=Action{query}")
+
+    assert response.status_code == 200
+    deadline.assert_called_once_with(budget)
+
+
+def test__list_movies__invalid_deadline(client):
+    response = client.get("/movies?genre=Action&deadline=0")
+
+    assert response.status_code == 422
+
+
+def test__list_movies__prefetch_next_page(mocker, client):
+    mocker.patch("app.prefetch.PREFETCH_NEXT_PAGE", True)
+    prefetch = mocker.patch("app.services.MovieService.prefetch")
+
+    async def list_(self, genre, offset, limit, cursor):
+        self.next_ids = [3, 4]
+        return [], 4
+
+    mocker.patch("app.services.MovieService.list", list_)
+    schedule = mocker.patch("app.prefetch.PREFETCHER.schedule")
+
+    assert client.get("/movies?limit=2").status_code == 200
+
+    (warm_up,) = schedule.call_args.args
+    asyncio.run(warm_up())
+    prefetch.assert_awaited_once_with([3, 4])
+
+
+def test__list_movies__openapi_response_schema(client):
+    schema = client.get("/openapi.json").json()
+
+    response = schema["paths"]["/movies"]["get"]["responses"]["200"]
+    assert response["content"]["application/json"]["schema"] == {
+        "$ref": "#/components/schemas/MoviesOutput"
+    }
+    assert "Movie" in schema["components"]["schemas"]
+
+
+def test__metrics(mocker, client):
+    mocker.patch("app.services.MovieService.list", return_value=([], 0))
+    client.get("/movies?genre=Action")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'movies_request_duration_seconds_count{status="200"}' in response.text
+
+
+def test__list_movies_batch__movie_search_unavailable(mocker, client):
+    mocker.patch(
+        "app.services.MovieService.list_many",
+        side_effect=DownstreamError("Movies ids can not be retrieved"),
+    )
+
+    response = client.post("/movies/batch", json={"queries": [{"genre": "Action"}]})
+
+    assert response.status_code == 503
+    assert response.json() == {"detail": "Movies ids can not be retrieved"}
+
+
+@pytest.mark.parametrize(
+    "batch",
+    (
+        {"queries": []},
+        {"queries": [{"genre": "Action"}] * 21},
+        {"queries": [{"limit": 0}]},
+        {"queries": [{"offset": -1}]},
+        {"queries": [{}], "deadline": 0},
+    ),
+)
+def test__list_movies_batch__invalid(client, batch):
+    response = client.post("/movies/batch", json=batch)
+
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("error", (RuntimeError("boom"), DownstreamError("down")))
+def test__list_movies__ndjson__load_released_on_error(mocker, client, error):
+    mocker.patch("app.services.MovieService.list_page_ids", side_effect=error)
+    load = prefetch.PREFETCHER.load
+
+    try:
+        client.get("/movies", headers={"Accept": "application/x-ndjson"})
+    except RuntimeError:
+        pass
+
+    assert prefetch.PREFETCHER.load == load
+
+
+def test__list_movies__ndjson__load_released(mocker, client):
+    mocker.patch("app.services.MovieService.list_page_ids", return_value=([], 0))
+    load = prefetch.PREFETCHER.load
+
+    response = client.get("/movies", headers={"Accept": "application/x-ndjson"})
+
+    assert response.status_code == 200
+    assert prefetch.PREFETCHER.load == load
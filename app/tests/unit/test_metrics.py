@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from starlette.responses import StreamingResponse
+
+from app.metrics import Counter, Histogram, Registry, observe_duration
+
+
+def test__Counter__render():
+    counter = Counter("attempts_total", "Attempts", ["downstream", "outcome"])
+
+    counter.inc(downstream="movie-info", outcome="200")
+    counter.inc(2, downstream="movie-info", outcome="200")
+    counter.inc(downstream='say "hi"', outcome="timeout")
+
+    assert counter.get(downstream="movie-info", outcome="200") == 3
+    assert counter.render().splitlines() == [
+        "# HELP attempts_total Attempts",
+        "# TYPE attempts_total counter",
+        'attempts_total{downstream="movie-info",outcome="200"} 3.0',
+        'attempts_total{downstream="say \\"hi\\"",outcome="timeout"} 1.0',
+    ]
+
+
+def test__Histogram__render():
+    histogram = Histogram("size", "Size", buckets=(1, 5))
+
+    for value in (1, 3, 5, 8):
+        histogram.observe(value)
+
+    assert histogram.count() == 4
+    assert histogram.render().splitlines()[2:] == [
+        'size_bucket{le="1"} 1',
+        'size_bucket{le="5"} 3',
+        'size_bucket{le="+Inf"} 4',
+        "size_sum 17.0",
+        "size_count 4",
+    ]
+
+
+def test__Registry__render():
+    registry = Registry()
+    registry.register(Counter("a_total", "A")).inc()
+    registry.register(Counter("b_total", "B"))
+
+    assert registry.render().splitlines() == [
+        "# HELP a_total A",
+        "# TYPE a_total counter",
+        "a_total 1.0",
+        "# HELP b_total B",
+        "# TYPE b_total counter",
+    ]
+
+
+def test__observe_duration__status():
+    histogram = Histogram("duration", "Duration", ["status"])
+
+    class NotFound(Exception):
+        status_code = 404
+
+    @observe_duration(histogram)
+    async def endpoint(fail: bool):
+        if fail:
+            raise NotFound()
+        return "ok"
+
+    assert asyncio.run(endpoint(False)) == "ok"
+    with pytest.raises(NotFound):
+        asyncio.run(endpoint(True))
+
+    assert histogram.count(status="200") == 1
+    assert histogram.count(status="404") == 1
+
+
+def test__observe_duration__streamed_body():
+    histogram = Histogram("duration", "Duration", ["status"])
+
+    async def body():
+        await asyncio.sleep(0.05)
+        yield b"movie\n"
+
+    @observe_duration(histogram)
+    async def endpoint():
+        return StreamingResponse(body())
+
+    async def run():
+        response = await endpoint()
+        assert histogram.count(status="200") == 0
+        return [chunk async for chunk in response.body_iterator]
+
+    assert asyncio.run(run()) == [b"movie\n"]
+    assert histogram.count(status="200") == 1
+    assert histogram.sums[("200",)] >= 0.05
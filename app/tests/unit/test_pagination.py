@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from app.cache import MemoryBackend
+from app.pagination import (
+    Cursor,
+    InvalidCursor,
+    SnapshotStore,
+    pack_ids,
+    unpack_ids,
+)
+
+
+def test__Cursor__encode_decode():
+    cursor = Cursor("0123456789abcdef", 20)
+
+    assert Cursor.decode(cursor.encode()) == cursor
+
+
+@pytest.mark.parametrize("token", ("", "not-a-cursor", "YWJj", "YTpi"))
+def test__Cursor__decode__invalid(token):
+    with pytest.raises(InvalidCursor):
+        Cursor.decode(token)
+
+
+@pytest.mark.parametrize("ids", ([], [1893, 1724, 955], [2 ** 40, 1]))
+def test__pack_ids(ids):
+    assert unpack_ids(pack_ids(ids)) == ids
+
+
+def test__pack_ids__compact():
+    ids = list(range(100000, 101000))
+
+    assert len(pack_ids(ids)) < len(str(ids)) * 0.7
+
+
+def test__SnapshotStore__same_list_is_stored_once():
+    backend = MemoryBackend()
+    store = SnapshotStore(backend, ttl=60)
+
+    async def run():
+        first = await store.save([1, 2, 3])
+        second = await store.save([1, 2, 3])
+        other = await store.save([3, 2, 1])
+        return first, second, other, await store.load(first), await store.load("x")
+
+    first, second, other, ids, expired = asyncio.run(run())
+
+    assert first == second != other
+    assert ids == [1, 2, 3]
+    assert expired is None
+    assert len(backend.cache) == 2
@@ -0,0 +1,55 @@
+import asyncio
+
+from app.prefetch import Prefetcher
+
+
+def test__Prefetcher__bounded_concurrency():
+    prefetcher = Prefetcher(max_concurrency=2, max_load=10)
+    done = []
+
+    async def warm_up():
+        await asyncio.sleep(0.01)
+        done.append(True)
+
+    async def run():
+        started = [prefetcher.schedule(warm_up) for _ in range(3)]
+        await asyncio.sleep(0.02)
+        return started
+
+    assert asyncio.run(run()) == [True, True, False]
+    assert len(done) == 2
+    assert len(prefetcher) == 0
+
+
+def test__Prefetcher__cancelled_under_load():
+    prefetcher = Prefetcher(max_concurrency=2, max_load=1)
+    done = []
+
+    async def warm_up():
+        await asyncio.sleep(0.01)
+        done.append(True)
+
+    async def run():
+        prefetcher.request_started()
+        assert prefetcher.schedule(warm_up)
+        prefetcher.request_started()
+        assert not prefetcher.schedule(warm_up)
+        await asyncio.sleep(0.02)
+        prefetcher.request_finished()
+        prefetcher.request_finished()
+
+    asyncio.run(run())
+
+    assert done == []
+    assert prefetcher.load == 0
+
+
+def test__Prefetcher__track_request():
+    prefetcher = Prefetcher(max_load=10)
+
+    request_finished = prefetcher.track_request()
+    assert prefetcher.load == 1
+    request_finished()
+    request_finished()
+
+    assert prefetcher.load == 0
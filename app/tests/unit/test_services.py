@@ -1,10 +1,34 @@
+import asyncio
+import httpx
 from urllib.parse import unquote
+from app.balancer import LoadBalancer, balancer_from_settings
+from app.breaker import CircuitBreaker
 from app.entities import GENDERS_MAP
 
 from app.schemas import CastMember, Movie
-from app.services import BaseService, CastService, MovieService, get_genre
+from app.metrics import (
+    CACHE_LOOKUPS,
+    DOWNSTREAM_ATTEMPTS,
+    DOWNSTREAM_FAILURES,
+    MOVIES_ERRORS,
+)
+from app.pagination import Cursor
+from app.retry import Deadline, RetryPolicy
+from app.settings import DownstreamSettings
+from app.services import (
+    BaseService,
+    CastService,
+    DownstreamError,
+    MovieService,
+    get_genre,
+    get_genres_names_from_list,
+)
 import pytest
-from app.tests.entities import FakeRequestClient, FakeResponse
+from app.tests.entities import (
+    FakeRequestClient,
+    FakeResponse,
+    SlowFakeRequestClient,
+)
 
 
 @pytest.mark.parametrize(
@@ -30,6 +54,11 @@ from app.tests.entities import FakeRequestClient, FakeResponse
             {},
             "http://localhost:3040/movies",
         ),
+        (
+            "/movies?genre=Action#top",
+            {"limit": 10},
+            "/movies?genre=Action&limit=10#top",
+        ),
     ),
 )
 def test__BaseService__add_query_params_to_url(url, query_params, expected_url):
@@ -59,7 +88,7 @@ def test__MovieService__list_ids__500_at_first_attempt(movies_ids):
     service = MovieService(client=client)
     genre = get_genre("Action")
 
-    assert service.list_ids(genre) == movies_ids
+    assert asyncio.run(service.list_ids(genre)) == movies_ids
     assert client.called == 2
 
 
@@ -82,6 +111,25 @@ def test__BaseService__split_list_with_max_lenght(list_, max_length, expected):
     assert BaseService.split_list_with_max_length(list_, max_length) == expected
 
 
+def test__BaseService__split_list_with_max_length__keeps_the_list():
+    list_ = [1, 2, 3, 4]
+
+    assert BaseService.split_list_with_max_length(list_, 3) == [[1, 2, 3], [4]]
+    assert list_ == [1, 2, 3, 4]
+
+
+@pytest.mark.parametrize(
+    "ids_list,expected",
+    (
+        ([18, 28], ["Action", "Drama"]),
+        ([28, 28, 1], ["Action"]),
+        ([1], []),
+    ),
+)
+def test__get_genres_names_from_list(ids_list, expected):
+    assert get_genres_names_from_list(ids_list) == expected
+
+
 def test__BaseService__request_unitl_status_code_is_200():
     client = FakeRequestClient(
         responses=[
@@ -91,7 +139,7 @@ def test__BaseService__request_unitl_status_code_is_200():
             FakeResponse(status_code=500),
         ]
     )
-    BaseService.request_until_status_code_is_200(client, url="")
+    asyncio.run(BaseService.request_until_status_code_is_200(client, url=""))
     assert client.called == 3
 
 
@@ -141,7 +189,7 @@ def test__BaseService__filter(list_, offset, limit, expected_result):
     assert BaseService.filter(list_, offset, limit) == expected_result
 
 
-def test__CastService__get_details__incomplete_cast_details(vin_disiel):
+def test__CastService__get_details__incomplete_cast_details(vin_disiel, single_attempt):
     cast_ids = [1, 2, 3, 4, 5, 6]
 
     client = FakeRequestClient(
@@ -162,8 +210,8 @@ def test__CastService__get_details__incomplete_cast_details(vin_disiel):
             ),
         ]
     )
-    cast_service = CastService(client)
-    details = cast_service.get_details(cast_ids)
+    cast_service = CastService(client, retry_policy=single_attempt)
+    details = asyncio.run(cast_service.get_details(cast_ids))
     assert details == [vin_disiel]
     assert cast_service.errors
 
@@ -242,7 +290,7 @@ def test__CastService__get_details__full_cast_details(vin_disiel):
         ]
     )
     cast_service = CastService(client)
-    details = cast_service.get_details(cast_ids)
+    details = asyncio.run(cast_service.get_details(cast_ids))
     assert details == expected_result
     assert not cast_service.errors
 
@@ -251,7 +299,9 @@ def test__MovieService___build_details_from_response():
     mid = "movie-id-1"
     fake_response = [MovieService.MovieDetailsResponse(id=mid)]
     movie_service = MovieService(client=None)
-    movies = movie_service._build_details_from_response(response=fake_response)
+    movies = asyncio.run(
+        movie_service._build_details_from_response(response=fake_response)
+    )
     assert movies == [Movie(id=mid)]
     assert movie_service.errors == [
         {"errorCode": 440, "message": "Movie id #movie-id-1 cast info is not complete"}
@@ -264,7 +314,7 @@ def test__MovieService__get_details__couldnt_get_details(mocker):
     movie_service = MovieService(client=None)
 
     movies_ids = [1, 2, 3]
-    movies = movie_service.get_details(movies_ids)
+    movies = asyncio.run(movie_service.get_details(movies_ids))
     assert movies == [
         Movie(
             id=str(id_),
@@ -312,7 +362,7 @@ def test__MovieService__get_details__for_some_movies(mocker, vin_disiel: CastMem
     movie_service = MovieService(client=None)
 
     movies_ids = [1, 2, 3, 4, 5, 6]
-    movies = movie_service.get_details(movies_ids)
+    movies = asyncio.run(movie_service.get_details(movies_ids))
     assert movies == [
         Movie(
             id=str(id_),
@@ -348,3 +398,665 @@ def test__MovieService__get_details__for_some_movies(mocker, vin_disiel: CastMem
         {"errorCode": 440, "message": "Movie id #4 cast info is not complete"},
         {"errorCode": 440, "message": "Movie id #5 cast info is not complete"},
     ]
+
+
+@pytest.mark.parametrize("max_concurrency,expected_max_in_flight", ((2, 2), (10, 4)))
+def test__MovieService__get_details__requests_batches_concurrently(
+    max_concurrency, expected_max_in_flight, single_attempt
+):
+    client = SlowFakeRequestClient(
+        responses=[FakeResponse(status_code=500)], delay=0.01
+    )
+    movie_service = MovieService(
+        client, max_concurrency=max_concurrency, retry_policy=single_attempt
+    )
+
+    movies = asyncio.run(movie_service.get_details(list(range(20))))
+
+    assert len(movies) == 20
+    assert client.called == 4
+    assert client.max_in_flight == expected_max_in_flight
+
+
+def test__MovieService___build_details_from_response__shared_cast_batched_once(
+    single_attempt,
+):
+    def artist(id_):
+        return {"id": str(id_), "gender": 2, "name": f"Artist {id_}", "profilePath": "www"}
+
+    client = FakeRequestClient(
+        responses=[
+            FakeResponse(
+                status_code=200, response={"data": [artist(i) for i in range(1, 6)]}
+            ),
+            FakeResponse(status_code=500),
+        ]
+    )
+    movie_service = MovieService(client, retry_policy=single_attempt)
+    fake_response = [
+        MovieService.MovieDetailsResponse(id="a", cast=[1, 2, 3]),
+        MovieService.MovieDetailsResponse(id="b", cast=[3, 4, 5, 6, 7, 8]),
+    ]
+
+    movies = asyncio.run(movie_service._build_details_from_response(fake_response))
+
+    assert client.called == 2
+    assert [member.id for member in movies[0].cast] == ["1", "2", "3"]
+    assert [member.id for member in movies[1].cast] == ["3", "4", "5"]
+    assert movie_service.errors == [
+        {"errorCode": 440, "message": "Movie id #b cast info is not complete"}
+    ]
+
+
+def test__BaseService__request_until_status_code_is_200__gives_up_after_max_attempts():
+    client = FakeRequestClient(responses=[FakeResponse(status_code=500)])
+    retry_policy = RetryPolicy(max_attempts=3, backoff_base=0)
+
+    response = asyncio.run(
+        BaseService.request_until_status_code_is_200(client, "", retry_policy)
+    )
+
+    assert response is None
+    assert client.called == 3
+
+
+def test__BaseService__request_until_status_code_is_200__stops_at_deadline():
+    client = FakeRequestClient(responses=[FakeResponse(status_code=500)])
+    retry_policy = RetryPolicy(max_attempts=1000, backoff_base=0.01, backoff_max=0.01)
+
+    response = asyncio.run(
+        BaseService.request_until_status_code_is_200(
+            client, "", retry_policy, Deadline(0.05)
+        )
+    )
+
+    assert response is None
+    assert 1 <= client.called < 1000
+
+
+def test__BaseService__request_until_status_code_is_200__attempt_timeout():
+    client = SlowFakeRequestClient(
+        responses=[FakeResponse(status_code=200)], delay=1
+    )
+    retry_policy = RetryPolicy(max_attempts=2, backoff_base=0, attempt_timeout=0.01)
+
+    response = asyncio.run(
+        BaseService.request_until_status_code_is_200(client, "", retry_policy)
+    )
+
+    assert response is None
+    assert client.called == 0
+
+
+def test__MovieService__list_ids__movie_search_down(single_attempt):
+    client = FakeRequestClient(responses=[FakeResponse(status_code=500)])
+    service = MovieService(client=client, retry_policy=single_attempt)
+
+    with pytest.raises(DownstreamError):
+        asyncio.run(service.list_ids())
+
+
+def test__MovieService__get_details__retries_movie_info():
+    client = FakeRequestClient(
+        responses=[
+            FakeResponse(status_code=500),
+            FakeResponse(
+                status_code=200,
+                response={
+                    "data": [
+                        dict.fromkeys(
+                            ("title", "releaseDate", "revenue", "posterPath", "genres", "cast")
+                        )
+                        | {"id": 1}
+                    ]
+                },
+            ),
+        ]
+    )
+    movie_service = MovieService(client, retry_policy=RetryPolicy(backoff_base=0))
+
+    movies = asyncio.run(movie_service.get_details([1]))
+
+    assert client.called == 2
+    assert movies == [Movie(id="1")]
+    assert movie_service.errors == [
+        {"errorCode": 440, "message": "Movie id #1 cast info is not complete"}
+    ]
+
+
+def test__MovieService__get_details__only_requests_cache_misses(mocker):
+    def details(id_):
+        return MovieService.MovieDetailsResponse(id=id_, title=f"Movie {id_}")
+
+    asyncio.run(
+        MovieService.details_cache.set_many({"2": details(2), "4": details(4)})
+    )
+    request_details = mocker.patch(
+        "app.services.MovieService._request_details",
+        side_effect=lambda ids: [details(id_) for id_ in ids],
+    )
+    movie_service = MovieService(client=None)
+
+    movies = asyncio.run(movie_service.get_details([1, 2, 3, 4, 5]))
+
+    request_details.assert_called_once_with(["1", "3", "5"])
+    assert [movie.id for movie in movies] == ["1", "2", "3", "4", "5"]
+
+    request_details.reset_mock()
+    movies = asyncio.run(movie_service.get_details([1, 2, 3, 4, 5]))
+
+    request_details.assert_not_called()
+    assert [movie.title for movie in movies] == [f"Movie {i}" for i in range(1, 6)]
+
+
+def test__CastService__get_details__cache_and_negative_entries(vin_disiel, single_attempt):
+    client = FakeRequestClient(
+        responses=[
+            FakeResponse(
+                status_code=200,
+                response={
+                    "data": [
+                        {
+                            "id": vin_disiel.id,
+                            "gender": 2,
+                            "name": vin_disiel.name,
+                            "profilePath": vin_disiel.profilePath,
+                        }
+                    ]
+                },
+            ),
+        ]
+    )
+
+    details = asyncio.run(
+        CastService(client, retry_policy=single_attempt).get_details([6, 7])
+    )
+    assert details == [vin_disiel]
+    assert client.called == 1
+    assert asyncio.run(CastService.cache.get_many(["6", "7"])) == {
+        "6": vin_disiel.dict(),
+        "7": None,
+    }
+
+    # both the artist and the missing id are served from the cache
+    details = asyncio.run(
+        CastService(client, retry_policy=single_attempt).get_details([7, 6])
+    )
+    assert details == [vin_disiel]
+    assert client.called == 1
+
+    # only the misses are batched
+    asyncio.run(CastService(client, retry_policy=single_attempt).get_details([6, 8, 9]))
+    assert client.called == 2
+    assert unquote(client.url).endswith("/artists?ids=8,9")
+
+
+def test__MovieService__list_ids__cached_by_genre(movies_ids):
+    client = FakeRequestClient(
+        responses=[FakeResponse(response={"data": movies_ids}, status_code=200)]
+    )
+    service = MovieService(client=client)
+
+    async def run():
+        await service.list_ids(get_genre("Action"))
+        await service.list_ids(get_genre("Action"))
+        await service.list_ids(get_genre("Drama"))
+
+    asyncio.run(run())
+
+    assert client.called == 2
+
+
+def test__MovieService__concurrent_requests_are_coalesced(movies_ids):
+    client = SlowFakeRequestClient(
+        responses=[FakeResponse(status_code=200, response={"data": movies_ids})]
+    )
+
+    async def run():
+        await asyncio.gather(
+            *[MovieService(client).list_ids(get_genre("Action")) for _ in range(5)]
+        )
+
+    asyncio.run(run())
+
+    assert client.called == 1
+
+
+def test__MovieService__get_details__concurrent_requests_share_full_batches(mocker):
+    request_details = mocker.patch(
+        "app.services.MovieService._request_details",
+        side_effect=lambda ids: [MovieService.MovieDetailsResponse(id=i) for i in ids],
+    )
+
+    async def run():
+        return await asyncio.gather(
+            MovieService(client=None).get_details([1, 2]),
+            MovieService(client=None).get_details([3, 4]),
+            MovieService(client=None).get_details([5, 6]),
+        )
+
+    pages = asyncio.run(run())
+
+    assert [[movie.id for movie in page] for page in pages] == [
+        ["1", "2"],
+        ["3", "4"],
+        ["5", "6"],
+    ]
+    assert [call.args[0] for call in request_details.call_args_list] == [
+        ["1", "2", "3", "4", "5"],
+        ["6"],
+    ]
+
+
+def test__MovieService__list__pages_with_cursor_skip_movie_search(mocker):
+    client = FakeRequestClient(
+        responses=[FakeResponse(status_code=200, response={"data": [1, 2, 3, 4, 5]})]
+    )
+    mocker.patch(
+        "app.services.MovieService.get_details",
+        side_effect=lambda ids: [Movie(id=str(i)) for i in ids],
+    )
+    genre = get_genre("Action")
+
+    async def run():
+        first_page = MovieService(client)
+        movies, total = await first_page.list(genre, 0, 2)
+        assert [m.id for m in movies] == ["1", "2"] and total == 5
+
+        # movie-search list changes, the cursor keeps using the snapshot
+        await MovieService.ids_cache.clear()
+        client._responses = [FakeResponse(status_code=200, response={"data": [9]})]
+
+        second_page = MovieService(client)
+        movies, _ = await second_page.list(
+            genre, None, 2, Cursor.decode(first_page.next_cursor)
+        )
+        assert [m.id for m in movies] == ["3", "4"]
+
+        last_page = MovieService(client)
+        movies, _ = await last_page.list(
+            genre, None, 2, Cursor.decode(second_page.next_cursor)
+        )
+        assert [m.id for m in movies] == ["5"]
+        assert last_page.next_cursor is None
+
+    asyncio.run(run())
+
+    assert client.called == 1
+
+
+def test__MovieService__get_details__shared_fetch_past_the_deadline(mocker):
+    async def slow_request_details(ids):
+        await asyncio.sleep(0.2)
+        return [MovieService.MovieDetailsResponse(id=int(i)) for i in ids]
+
+    mocker.patch(
+        "app.services.MovieService._request_details", side_effect=slow_request_details
+    )
+
+    async def run():
+        # the fetch is started by a request without deadline and shared
+        patient = asyncio.ensure_future(MovieService(client=None).get_details([1]))
+        await asyncio.sleep(0)
+        hurried = MovieService(client=None, deadline=Deadline(0.05))
+        movies = await hurried.get_details([1])
+        assert not patient.done()
+        return hurried, movies, await patient
+
+    hurried, movies, patient_movies = asyncio.run(run())
+
+    assert [movie.id for movie in movies] == ["1"]
+    assert [error["errorCode"] for error in hurried.errors] == [450, 440]
+    assert [movie.id for movie in patient_movies] == ["1"]
+
+
+def test__CastService__get_details__deadline_exceeded(mocker):
+    async def slow_fetch_batch(ids):
+        await asyncio.sleep(0.2)
+        return {}
+
+    mocker.patch("app.services.CastService._fetch_batch", side_effect=slow_fetch_batch)
+    service = CastService(client=None, deadline=Deadline(0.05))
+
+    cast = asyncio.run(service.get_details([1, 2]))
+
+    assert cast is None
+    assert service.failed_ids == {"1", "2"}
+    assert [error["errorCode"] for error in service.errors] == [460]
+
+
+def test__MovieService__get_details__circuit_open(mocker, single_attempt):
+    breaker = CircuitBreaker("movie-info", min_requests=1, cool_down=60)
+    mocker.patch.object(MovieService, "details_breaker", breaker)
+    client = FakeRequestClient(responses=[FakeResponse(status_code=500)])
+
+    service = MovieService(client=client, retry_policy=single_attempt)
+    asyncio.run(service.get_details([1]))
+    assert breaker.state == CircuitBreaker.OPEN
+
+    service = MovieService(client=client, retry_policy=single_attempt)
+    movies = asyncio.run(service.get_details([2]))
+
+    assert [movie.id for movie in movies] == ["2"]
+    assert [error["errorCode"] for error in service.errors] == [450, 440]
+    # movie-info isn't called while the circuit is open
+    assert client.called == 1
+
+
+def test__MovieService__get_details__downstream_settings(mocker, single_attempt):
+    details_settings = DownstreamSettings(
+        name="movie-info", urls=("http://movie-info:8080",), max_in_flight=1
+    )
+    mocker.patch.object(MovieService, "details_settings", details_settings)
+    mocker.patch.object(
+        MovieService, "details_balancer", balancer_from_settings(details_settings)
+    )
+    client = SlowFakeRequestClient(
+        responses=[FakeResponse(status_code=500)], delay=0.01
+    )
+
+    async def run():
+        # the cap is shared by the services of every request
+        await asyncio.gather(
+            *(
+                MovieService(client, retry_policy=single_attempt).get_details(
+                    list(range(page * 5, page * 5 + 5))
+                )
+                for page in range(3)
+            )
+        )
+
+    asyncio.run(run())
+
+    assert client.called == 3
+    assert client.max_in_flight == 1
+    assert client.url.startswith("http://movie-info:8080/movies?")
+
+
+def test__MovieService___request_details__retries_on_another_replica(mocker):
+    mocker.patch.object(
+        MovieService, "details_balancer", LoadBalancer(["http://a", "http://b"])
+    )
+    client = FakeRequestClient(
+        responses=[
+            FakeResponse(status_code=500),
+            FakeResponse(status_code=200, response={"data": []}),
+        ]
+    )
+    urls = []
+    get = client.get
+
+    async def record_get(url, data=None):
+        urls.append(url)
+        return await get(url, data)
+
+    client.get = record_get
+    service = MovieService(client, retry_policy=RetryPolicy(backoff_base=0))
+
+    assert asyncio.run(service._request_details([1])) == []
+    assert sorted(urls) == ["http://a/movies?id=1", "http://b/movies?id=1"]
+
+
+def test__MovieService__get_details__metrics(single_attempt):
+    client = FakeRequestClient(responses=[FakeResponse(status_code=500)])
+    service = MovieService(client, retry_policy=single_attempt)
+    attempts = DOWNSTREAM_ATTEMPTS.get(downstream="movie-info", outcome="500")
+    failures = DOWNSTREAM_FAILURES.get(downstream="movie-info")
+    errors = MOVIES_ERRORS.get(code="450")
+    misses = CACHE_LOOKUPS.get(cache="movie", result="miss")
+
+    asyncio.run(service.get_details([1, 2]))
+
+    assert (
+        DOWNSTREAM_ATTEMPTS.get(downstream="movie-info", outcome="500")
+        == attempts + 1
+    )
+    assert DOWNSTREAM_FAILURES.get(downstream="movie-info") == failures + 1
+    assert MOVIES_ERRORS.get(code="450") == errors + 2
+    assert CACHE_LOOKUPS.get(cache="movie", result="miss") == misses + 2
+
+
+def test__MovieService__list_many(mocker):
+    genres_ids = {"Action": [1, 2], "Drama": [2, 3]}
+
+    async def list_ids(self, genre=None):
+        if genre["name"] not in genres_ids:
+            raise DownstreamError("Movies ids can not be retrieved")
+        return genres_ids[genre["name"]]
+
+    async def request_details(ids):
+        return [MovieService.MovieDetailsResponse(id=int(i)) for i in ids]
+
+    mocker.patch.object(MovieService, "list_ids", list_ids)
+    request_details = mocker.patch(
+        "app.services.MovieService._request_details", side_effect=request_details
+    )
+    service = MovieService(client=None)
+
+    action, drama, horror = asyncio.run(
+        service.list_many(
+            [
+                (get_genre("Action"), 0, 10),
+                (get_genre("Drama"), 0, 1),
+                (get_genre("Horror"), 0, 10),
+            ]
+        )
+    )
+
+    # the movie shared by both pages is requested once, in a single batch
+    request_details.assert_called_once_with(["1", "2"])
+    assert [movie.id for movie in action.movies] == ["1", "2"]
+    assert (action.total, action.next_cursor) == (2, None)
+    assert [error["errorCode"] for error in action.errors] == [440, 440]
+    assert [movie.id for movie in drama.movies] == ["2"]
+    assert drama.total == 2 and drama.next_cursor
+    assert [error["message"] for error in drama.errors] == [
+        "Movie id #2 cast info is not complete"
+    ]
+    assert (horror.movies, horror.total) == ([], 0)
+    assert [error["errorCode"] for error in horror.errors] == [503]
+
+
+def test__MovieService__page_errors(mocker):
+    mocker.patch("app.services.MovieService._request_details", return_value=None)
+    service = MovieService(client=None)
+    asyncio.run(service.get_details([1, 2]))
+
+    # as listed alone: the missing details first, then the incomplete casts
+    assert [error["errorCode"] for error in service.page_errors([2])] == [450, 440]
+    assert [
+        error["errorCode"] for error in service.page_errors([1, 2])
+    ] == [450, 450, 440, 440]
+    assert service.page_errors([3]) is None
+
+
+def test__MovieService__list_many__every_query_failed(mocker):
+    mocker.patch(
+        "app.services.MovieService.list_ids",
+        side_effect=DownstreamError("Movies ids can not be retrieved"),
+    )
+
+    with pytest.raises(DownstreamError):
+        asyncio.run(MovieService(client=None).list_many([(None, 0, 10)]))
+
+
+def test__MovieService__stream_details__closed(mocker):
+    cancelled = []
+
+    async def get_details(self, movies_ids):
+        try:
+            await asyncio.sleep(0 if movies_ids == [1] else 1)
+        except asyncio.CancelledError:
+            cancelled.extend(movies_ids)
+            raise
+        return [Movie.construct(id=str(movies_ids[0]))]
+
+    mocker.patch.object(MovieService, "get_details", get_details)
+
+    async def run():
+        stream = MovieService(client=None).stream_details([1, 2, 3])
+        movie = await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0)
+        return movie
+
+    assert asyncio.run(run()).id == "1"
+    assert sorted(cancelled) == [2, 3]
+
+
+def test__MovieService__get_details__shared_batch_keeps_its_deadline():
+    details = [
+        {
+            "id": mid,
+            "title": None,
+            "releaseDate": None,
+            "revenue": None,
+            "posterPath": None,
+            "genres": [],
+            "cast": [],
+        }
+        for mid in (1, 2, 3, 4)
+    ]
+    client = SlowFakeRequestClient(
+        responses=[FakeResponse(status_code=200, response={"data": details})],
+        delay=0.05,
+    )
+    hurried = MovieService(client=client, deadline=Deadline(0.01))
+    patient = MovieService(client=client, deadline=Deadline(10))
+
+    async def run():
+        return await asyncio.gather(
+            hurried.get_details([1, 2]), patient.get_details([3, 4])
+        )
+
+    asyncio.run(run())
+
+    # a single batch, that the request with the longer deadline waits for
+    assert client.called == 1
+    assert [error["errorCode"] for error in hurried.errors] == [450, 450, 440, 440]
+    assert [error["errorCode"] for error in patient.errors] == [440, 440]
+
+
+def test__MovieService__list_ids__shared_flight_keeps_its_deadline(movies_ids):
+    client = SlowFakeRequestClient(
+        responses=[FakeResponse(status_code=200, response={"data": movies_ids})],
+        delay=0.05,
+    )
+    hurried = MovieService(client=client, deadline=Deadline(0.01))
+    patient = MovieService(client=client, deadline=Deadline(10))
+
+    async def run():
+        return await asyncio.gather(
+            hurried._request_ids(get_genre("Action")),
+            patient._request_ids(get_genre("Action")),
+            return_exceptions=True,
+        )
+
+    hurried_ids, patient_ids = asyncio.run(run())
+
+    assert isinstance(hurried_ids, DownstreamError)
+    assert patient_ids == movies_ids
+    assert client.called == 1
+
+
+@pytest.mark.parametrize(
+    "retry_policy,deadline,state",
+    (
+        # the attempts are cut short by the caller's deadline
+        (RetryPolicy(max_attempts=1), 0.01, CircuitBreaker.CLOSED),
+        # the attempts time out on their own
+        (RetryPolicy(max_attempts=1, attempt_timeout=0.01), None, CircuitBreaker.OPEN),
+    ),
+)
+def test__BaseService__request_until_status_code_is_200__timeouts_in_breaker(
+    retry_policy, deadline, state
+):
+    breaker = CircuitBreaker("movie-info", min_requests=10, cool_down=60)
+    client = SlowFakeRequestClient(
+        responses=[FakeResponse(status_code=200, response={"data": []})], delay=0.05
+    )
+
+    async def run():
+        for _ in range(12):
+            await BaseService.request_until_status_code_is_200(
+                client,
+                "/movies?id=1",
+                retry_policy,
+                Deadline(deadline),
+                breaker=breaker,
+            )
+
+    asyncio.run(run())
+
+    assert breaker.state == state
+
+
+def test__BaseService__request_until_status_code_is_200__error_ends_the_trial():
+    breaker = CircuitBreaker("movie-info", min_requests=1, cool_down=60)
+    breaker.record_failure()
+    breaker._opened_at -= 60
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    class DecodingErrorClient(FakeRequestClient):
+        async def get(self, url, data=None):
+            raise httpx.DecodingError("invalid gzip")
+
+    with pytest.raises(httpx.DecodingError):
+        asyncio.run(
+            BaseService.request_until_status_code_is_200(
+                DecodingErrorClient(), "/movies?id=1", breaker=breaker
+            )
+        )
+
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test__CastService__get_details__errors_by_batch_size(mocker):
+    settings = DownstreamSettings(
+        name="artist-info", urls=("http://artist-info:8080",), batch_size=2
+    )
+    mocker.patch.object(CastService, "settings", settings)
+
+    async def failed_batch(ids):
+        return dict.fromkeys(ids)
+
+    mocker.patch("app.services.CastService._fetch_batch", side_effect=failed_batch)
+    service = CastService(client=None)
+
+    asyncio.run(service.get_details([1, 2, 3]))
+
+    assert [error["message"] for error in service.errors] == [
+        "Cast id's #['1', '2'] details info is not complete",
+        "Cast id's #['3'] details info is not complete",
+    ]
+
+
+def test__BaseService__request_until_status_code_is_200__logs_truncated_text(mocker):
+    logger = mocker.patch("app.services.logger")
+    mocker.patch("app.services.LOG_MAX_FIELD_LENGTH", 10)
+    response = FakeResponse(status_code=200)
+    response.text = '{"data": [1, 2, 3, 4, 5]}'
+    response.json = mocker.Mock()
+
+    asyncio.run(
+        BaseService.request_until_status_code_is_200(
+            FakeRequestClient(responses=[response]), "/movies"
+        )
+    )
+
+    (_, kwargs), = [
+        c for c in logger.info.call_args_list if c.args == ("Response Sucessfull",)
+    ]
+    assert kwargs["response"].fn() == '{"data": ['
+    response.json.assert_not_called()
+
+
+def test__MovieService__prefetch__errors_not_counted(single_attempt):
+    client = FakeRequestClient(responses=[FakeResponse(status_code=500)])
+    service = MovieService(client, retry_policy=single_attempt, count_errors=False)
+    errors = {code: MOVIES_ERRORS.get(code=code) for code in ("440", "450")}
+
+    asyncio.run(service.prefetch([1, 2]))
+
+    assert service.errors
+    assert {code: MOVIES_ERRORS.get(code=code) for code in ("440", "450")} == errors
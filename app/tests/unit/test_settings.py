@@ -0,0 +1,54 @@
+import asyncio
+
+from app import settings
+from app.settings import DownstreamSettings, downstream_settings
+
+
+def test__downstream_settings__defaults():
+    downstream = downstream_settings("TEST", "http://localhost:3030")
+
+    assert downstream.name == "test"
+    assert downstream.urls == ("http://localhost:3030",)
+    assert downstream.batch_size == 5
+    assert downstream.retry_policy.max_attempts == 5
+
+
+def test__downstream_settings__from_env(monkeypatch):
+    monkeypatch.setenv("TEST_URLS", "http://a:1/, http://b:2")
+    monkeypatch.setenv("TEST_BATCH_SIZE", "20")
+    monkeypatch.setenv("TEST_MAX_IN_FLIGHT", "3")
+    monkeypatch.setenv("TEST_MAX_ATTEMPTS", "2")
+    monkeypatch.setenv("TEST_ATTEMPT_TIMEOUT", "0.5")
+
+    downstream = downstream_settings("TEST", "http://localhost:3030")
+
+    assert downstream.urls == ("http://a:1", "http://b:2")
+    assert downstream.batch_size == 20
+    assert downstream.max_in_flight == 3
+    assert downstream.retry_policy.max_attempts == 2
+    assert downstream.retry_policy.attempt_timeout == 0.5
+
+
+def test__downstream_settings__env_overrides_file(mocker, monkeypatch):
+    mocker.patch.object(
+        settings, "_FILE_SETTINGS", {"TEST_BATCH_SIZE": 10, "TEST_MAX_IN_FLIGHT": 7}
+    )
+    monkeypatch.setenv("TEST_BATCH_SIZE", "20")
+
+    downstream = downstream_settings("TEST", "http://localhost:3030")
+
+    assert downstream.batch_size == 20
+    assert downstream.max_in_flight == 7
+
+
+def test__DownstreamSettings__in_flight_shared_within_the_loop():
+    downstream = DownstreamSettings(name="test", urls=("http://a",), max_in_flight=2)
+
+    async def in_flight():
+        return downstream.in_flight(), downstream.in_flight()
+
+    first, second = asyncio.run(in_flight())
+    assert first is second
+    assert first._value == 2
+    # a new event loop gets its own semaphore
+    assert asyncio.run(in_flight())[0] is not first
@@ -0,0 +1,66 @@
+import asyncio
+import io
+import json
+
+import structlog
+from starlette.responses import Response
+
+from app import tracing
+from app.log import QueueWriter
+from app.tracing import Trace, span, traced
+
+
+def test__span__without_trace():
+    with span("list_ids") as span_:
+        assert span_ is None
+
+
+def test__traced__server_timing_header():
+    @traced("movies")
+    async def endpoint():
+        with span("list_ids"):
+            pass
+        with span("details"):
+            await asyncio.gather(*(child() for _ in range(2)))
+        return Response()
+
+    async def child():
+        with span("movie-info", path="/movies?id=1"):
+            await asyncio.sleep(0)
+
+    response = asyncio.run(endpoint())
+
+    names = [
+        entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")
+    ]
+    assert names == ["movies", "list_ids", "details", "movie-info"]
+    assert "movie-info;dur=" in response.headers["Server-Timing"]
+    assert '"2 spans"' in response.headers["Server-Timing"]
+
+
+def test__traced__exports_spans(mocker):
+    stream = io.StringIO()
+    exporter = QueueWriter([structlog.processors.JSONRenderer()], stream=stream)
+    mocker.patch.object(tracing, "EXPORTER", exporter)
+
+    @traced("movies")
+    async def endpoint():
+        with span("list_ids", genre="Action"):
+            return "not a response"
+
+    assert asyncio.run(endpoint()) == "not a response"
+    exporter.flush()
+    exporter.stop()
+
+    child, root = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert root["name"] == "movies" and root["parentSpanId"] is None
+    assert child["name"] == "list_ids"
+    assert child["parentSpanId"] == root["spanId"]
+    assert child["traceId"] == root["traceId"]
+    assert child["attributes"] == {"genre": "Action"}
+    assert root["startTimeUnixNano"] <= child["startTimeUnixNano"]
+    assert child["endTimeUnixNano"] <= root["endTimeUnixNano"]
+
+
+def test__Trace__server_timing_empty():
+    assert Trace().server_timing() == ""
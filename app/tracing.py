@@ -0,0 +1,155 @@
+import functools
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+
+import structlog
+from starlette.responses import Response
+
+from app.log import QueueWriter
+
+# Add the `Server-Timing` header to the traced responses
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1") == "1"
+# File where the finished spans are appended, one JSON object per line, with
+# the OpenTelemetry span fields. Disabled when not set.
+TRACE_EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE")
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "attributes",
+        "start_ns",
+        "_started",
+        "duration",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str],
+        attributes: Dict[str, Any],
+    ) -> None:
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self._started = time.perf_counter()
+        self.duration: Optional[float] = None
+
+    def end(self) -> None:
+        self.duration = time.perf_counter() - self._started
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.start_ns + int((self.duration or 0) * 1e9),
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    """Spans of a single request"""
+
+    def __init__(self) -> None:
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List[Span] = []
+
+    def server_timing(self) -> str:
+        """`Server-Timing` header value with the total duration by span name,
+        in the order they started"""
+        totals: Dict[str, List[float]] = {}
+        for span_ in sorted(self.spans, key=lambda s: s.start_ns):
+            total = totals.setdefault(span_.name, [0.0, 0])
+            total[0] += span_.duration or 0
+            total[1] += 1
+
+        return ", ".join(
+            f"{name};dur={duration * 1000:.1f}"
+            + (f';desc="{count} spans"' if count > 1 else "")
+            for name, (duration, count) in totals.items()
+        )
+
+
+_TRACE: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_SPAN: ContextVar[Optional[Span]] = ContextVar("span", default=None)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Time the block as a child of the current span, if a trace is active
+
+    NOTE: the tasks started inside copy the context, so their spans belong to
+    the trace of the request that started them (e.g. a shared batch).
+    """
+    trace = _TRACE.get()
+    if trace is None:
+        yield None
+        return
+
+    parent = _SPAN.get()
+    span_ = Span(name, trace.trace_id, parent and parent.span_id, attributes)
+    token = _SPAN.set(span_)
+    try:
+        yield span_
+    finally:
+        span_.end()
+        _SPAN.reset(token)
+        trace.spans.append(span_)
+
+
+EXPORTER: Optional[QueueWriter] = (
+    QueueWriter(
+        [structlog.processors.JSONRenderer()],
+        stream=open(TRACE_EXPORT_FILE, "a", buffering=1),
+    )
+    if TRACE_EXPORT_FILE
+    else None
+)
+
+
+def traced(name: str):
+    """Trace the decorated endpoint under a root span `name`
+
+    The spans are exported and, when the endpoint returns a response, their
+    durations are added as the `Server-Timing` header. Streamed responses
+    only include the spans finished before the stream starts.
+    """
+
+    def decorator(endpoint: Callable[..., Awaitable]):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            if not (SERVER_TIMING or EXPORTER):
+                return await endpoint(*args, **kwargs)
+
+            trace = Trace()
+            token = _TRACE.set(trace)
+            try:
+                with span(name):
+                    response = await endpoint(*args, **kwargs)
+            finally:
+                _TRACE.reset(token)
+                if EXPORTER is not None:
+                    for span_ in trace.spans:
+                        EXPORTER.put(span_.to_dict())
+
+            if SERVER_TIMING and isinstance(response, Response):
+                response.headers["Server-Timing"] = trace.server_timing()
+
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,125 @@
+"""Micro-benchmarks of the services helpers on large id lists
+
+Every helper is timed against its previous implementation, kept here as the
+baseline, on the same inputs.
+
+    poetry run python -m benchmarks.helpers --ids 10000
+"""
+import argparse
+import random
+import timeit
+from typing import Callable, Dict, List, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+from app.entities import GENRES_MAP
+from app.services import BaseService, get_genre, get_genres_names_from_list
+
+
+def legacy_split_list_with_max_length(list_, max_length) -> List[List[int]]:
+    new_list: list = []
+
+    while list_:
+        new_list.append(list_[:max_length])
+        for _ in range(max_length):
+            if not list_:
+                break
+            list_.pop(0)
+
+    return new_list
+
+
+def legacy_add_query_params_to_url(url: str, query_params: dict) -> str:
+    url_parts = list(urlparse(url))
+    query = dict(parse_qsl(url_parts[4]))
+    query.update(query_params)
+    url_parts[4] = urlencode(query)
+
+    return urlunparse(url_parts)
+
+
+def legacy_get_genre(name: str):
+    for genre in GENRES_MAP:
+        if name == genre["name"]:
+            return {"id": genre["id"], "name": genre["name"]}
+
+
+def legacy_get_genres_names_from_list(ids_list: List[int]) -> List[str]:
+    return [genre["name"] for genre in GENRES_MAP if genre["id"] in ids_list]
+
+
+Case = Tuple[Callable[[], object], Callable[[], object]]
+
+
+def build_cases(ids: int, seed: int = 0) -> Dict[str, Case]:
+    """(legacy, current) callables by helper, on `ids` movies/artists ids"""
+    rng = random.Random(seed)
+    ids_list = list(range(1, ids + 1))
+    genres_ids = [genre["id"] for genre in GENRES_MAP]
+    movies_genres = [rng.sample(genres_ids, rng.randint(1, 3)) for _ in ids_list]
+    names = [rng.choice(GENRES_MAP)["name"] for _ in ids_list]
+    batches = BaseService.split_list_with_max_length(ids_list, 5)
+    url = "http://localhost:3030/movies"
+
+    return {
+        # NOTE: the legacy split empties its input, so it gets a copy
+        "split_list_with_max_length": (
+            lambda: legacy_split_list_with_max_length(list(ids_list), 5),
+            lambda: BaseService.split_list_with_max_length(list(ids_list), 5),
+        ),
+        "add_query_params_to_url": (
+            lambda: [
+                legacy_add_query_params_to_url(url, {"ids": ",".join(map(str, b))})
+                for b in batches
+            ],
+            lambda: [
+                BaseService.add_query_params_to_url(url, {"ids": ",".join(map(str, b))})
+                for b in batches
+            ],
+        ),
+        "get_genre": (
+            lambda: [legacy_get_genre(name) for name in names],
+            lambda: [get_genre(name) for name in names],
+        ),
+        "get_genres_names_from_list": (
+            lambda: [legacy_get_genres_names_from_list(g) for g in movies_genres],
+            lambda: [get_genres_names_from_list(g) for g in movies_genres],
+        ),
+    }
+
+
+def run(ids: int, repeat: int = 5, seed: int = 0) -> Dict[str, Dict[str, float]]:
+    """Best time in ms of the legacy and current helpers, and the speedup"""
+    results = {}
+    for name, (legacy, current) in build_cases(ids, seed).items():
+        assert legacy() == current(), f"{name} results differ"
+        legacy_ms, current_ms = (
+            min(timeit.repeat(fn, number=1, repeat=repeat)) * 1000
+            for fn in (legacy, current)
+        )
+        results[name] = {
+            "legacy_ms": round(legacy_ms, 3),
+            "current_ms": round(current_ms, 3),
+            "speedup": round(legacy_ms / current_ms, 1) if current_ms else None,
+        }
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ids", type=int, action="append", help="repeatable")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for ids in args.ids or (1000, 10000):
+        print(f"== {ids} ids")
+        for name, result in run(ids, args.repeat, args.seed).items():
+            print(
+                f"  {name}: {result['legacy_ms']}ms -> {result['current_ms']}ms "
+                f"(x{result['speedup']})"
+            )
+
+
+if __name__ == "__main__":
+    main()
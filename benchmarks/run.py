@@ -0,0 +1,208 @@
+"""Benchmark /movies against local stub downstreams
+
+Every scenario starts fresh stubs and caches, drives /movies with a
+concurrent load generator and reports the throughput, the latency
+percentiles and the calls received by each downstream. The app and the stubs
+run in process over ASGI transports, so no ports nor docker are needed.
+
+    poetry run python -m benchmarks.run --scenario docker-compose --requests 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+# NOTE: keep the logs out of the measures, must be set before importing the app
+os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+
+import httpx  # noqa: E402
+
+from app import cache, settings  # noqa: E402
+from app.breaker import ARTIST_INFO_BREAKER, MOVIE_INFO_BREAKER  # noqa: E402
+from app.client import create_http_client  # noqa: E402
+from app.entities import GENRES_MAP  # noqa: E402
+from app.main import app  # noqa: E402
+from app.metrics import REGISTRY  # noqa: E402
+from app.pagination import ID_SNAPSHOTS  # noqa: E402
+from benchmarks.stubs import Catalog, StubSettings, create_stubs  # noqa: E402
+
+
+@dataclass
+class Scenario:
+    description: str
+    movie_search: StubSettings
+    movie_info: StubSettings
+    artist_info: StubSettings
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "ideal": Scenario(
+        "Fast downstreams that never fail",
+        StubSettings("fixed:0.005"),
+        StubSettings("fixed:0.005", max_allowed=5),
+        StubSettings("fixed:0.005", max_allowed=5),
+    ),
+    "docker-compose": Scenario(
+        "Failure rates of docker-compose.yml (10/20/50%)",
+        StubSettings("lognormal:0.02,0.5", 0.1),
+        StubSettings("lognormal:0.02,0.5", 0.2, max_allowed=5),
+        StubSettings("lognormal:0.02,0.5", 0.5, max_allowed=5),
+    ),
+    "slow-tail": Scenario(
+        "No failures but a long latency tail",
+        StubSettings("lognormal:0.01,1.2"),
+        StubSettings("lognormal:0.01,1.2", max_allowed=5),
+        StubSettings("lognormal:0.01,1.2", max_allowed=5),
+    ),
+}
+
+
+def percentile(values: List[float], percent: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+
+    ordered = sorted(values)
+    rank = max(int(-(-percent * len(ordered) // 100)), 1)
+    return ordered[rank - 1]
+
+
+async def reset_state() -> None:
+    """Start every scenario cold"""
+    caches = (cache.MOVIE_DETAILS_CACHE, cache.ARTIST_CACHE, cache.MOVIES_IDS_CACHE)
+    for cache_ in caches:
+        await cache_.clear()
+    await ID_SNAPSHOTS.clear()
+    for breaker in (MOVIE_INFO_BREAKER, ARTIST_INFO_BREAKER):
+        if breaker is not None:
+            breaker.reset()
+    REGISTRY.clear()
+
+
+def downstream_client(stubs) -> httpx.AsyncClient:
+    """Client of the app routing every replica URL to its stub"""
+    downstreams = (settings.MOVIE_SEARCH, settings.MOVIE_INFO, settings.ARTIST_INFO)
+    return create_http_client(
+        mounts={
+            url: httpx.ASGITransport(app=stubs[downstream.name].app)
+            for downstream in downstreams
+            for url in downstream.urls
+        }
+    )
+
+
+async def run_scenario(
+    name: str, requests: int, concurrency: int, seed: int = 0
+) -> dict:
+    scenario = SCENARIOS[name]
+    stubs = create_stubs(
+        Catalog.generate(seed=seed),
+        scenario.movie_search,
+        scenario.movie_info,
+        scenario.artist_info,
+        seed=seed,
+    )
+    await reset_state()
+    app.state.http_client = downstream_client(stubs)
+    rng = random.Random(seed)
+    queries = [
+        {"genre": rng.choice(GENRES_MAP)["name"], "offset": rng.randrange(0, 50, 10)}
+        for _ in range(requests)
+    ]
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    partial = 0
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal partial
+        while queries:
+            params = queries.pop()
+            started = time.perf_counter()
+            response = await client.get("/movies", params=params)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+            if response.status_code == 200 and response.json()["errors"]:
+                partial += 1
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://app"
+        ) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+    finally:
+        await app.state.http_client.aclose()
+
+    return {
+        "scenario": name,
+        "description": scenario.description,
+        "requests": requests,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "throughput": round(requests / elapsed, 1),
+        "latency_ms": {
+            label: round(percentile(latencies, p) * 1000, 1)
+            for label, p in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100))
+        },
+        "statuses": dict(statuses),
+        "partial_responses": partial,
+        "downstream": {name: stub.stats.as_dict() for name, stub in stubs.items()},
+    }
+
+
+def format_report(result: dict) -> str:
+    latency = result["latency_ms"]
+    lines = [
+        f"== {result['scenario']}: {result['description']}",
+        f"{result['requests']} requests, {result['concurrency']} concurrent, "
+        f"{result['seconds']}s, {result['throughput']} req/s",
+        f"latency ms p50={latency['p50']} p95={latency['p95']} "
+        f"p99={latency['p99']} max={latency['max']}",
+        f"statuses {result['statuses']}, partial {result['partial_responses']}",
+    ]
+    for name, stats in result["downstream"].items():
+        lines.append(
+            f"  {name}: {stats['requests']} calls, {stats['ids']} ids, "
+            f"{stats['failures']} failed, {stats['rejected']} rejected"
+        )
+
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=sorted(SCENARIOS),
+        help="repeat to run several, all by default",
+    )
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    async def run() -> List[dict]:
+        return [
+            await run_scenario(name, args.requests, args.concurrency, args.seed)
+            for name in args.scenario or sorted(SCENARIOS)
+        ]
+
+    results = asyncio.run(run())
+    for result in results:
+        print(format_report(result))
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
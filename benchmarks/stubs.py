@@ -0,0 +1,221 @@
+"""Local stand-ins of movie-search, movie-info and artist-info
+
+They answer like the real services from a generated, reproducible catalog,
+with a configurable latency distribution, failure rate and max batch size.
+
+Serve them on the usual ports (requires uvicorn):
+
+    poetry run python -m benchmarks.stubs --fail 0.1,0.2,0.5
+"""
+import argparse
+import asyncio
+import math
+import random
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app.entities import GENRES_MAP
+
+Latency = Callable[[random.Random], float]
+
+
+def parse_latency(spec: str) -> Latency:
+    """Latency distribution in seconds from its spec
+
+    * `fixed:<seconds>`
+    * `uniform:<min>,<max>`
+    * `lognormal:<median>,<sigma>` long tail, most requests close to median
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(*values)
+    if kind == "lognormal" and len(values) == 2:
+        median, sigma = values
+        return lambda rng: rng.lognormvariate(math.log(median), sigma)
+
+    raise ValueError(f"Invalid latency spec {spec!r}")
+
+
+@dataclass
+class Catalog:
+    """Movies and artists generated from a seed"""
+
+    movies: Dict[int, dict]
+    artists: Dict[int, dict]
+
+    @classmethod
+    def generate(cls, movies: int = 2000, artists: int = 3000, seed: int = 0):
+        rng = random.Random(seed)
+        genres = [genre["id"] for genre in GENRES_MAP]
+        artists_ids = list(range(1, artists + 1))
+        return cls(
+            movies={
+                mid: {
+                    "id": mid,
+                    "title": f"Movie {mid}",
+                    "releaseDate": (
+                        date(1950, 1, 1) + timedelta(days=rng.randrange(25000))
+                    ).isoformat(),
+                    "revenue": rng.randrange(10 ** 9),
+                    "posterPath": f"https://image.tmdb.org/t/p/w342/{mid}.jpg",
+                    "genres": rng.sample(genres, rng.randint(1, 3)),
+                    "cast": rng.sample(artists_ids, rng.randint(3, 8)),
+                }
+                for mid in range(1, movies + 1)
+            },
+            artists={
+                aid: {
+                    "id": aid,
+                    "name": f"Artist {aid}",
+                    "profilePath": f"https://image.tmdb.org/t/p/w185/{aid}.jpg",
+                    "gender": rng.randint(0, 2),
+                }
+                for aid in artists_ids
+            },
+        )
+
+    def movies_ids(self, genre: Optional[str]) -> List[int]:
+        if not genre:
+            return list(self.movies)
+
+        genre_id = next((g["id"] for g in GENRES_MAP if g["name"] == genre), None)
+        return [mid for mid, m in self.movies.items() if genre_id in m["genres"]]
+
+
+@dataclass
+class StubSettings:
+    latency: str = "fixed:0"
+    fail_percent: float = 0.0
+    max_allowed: Optional[int] = None
+
+
+@dataclass
+class StubStats:
+    requests: int = 0
+    failures: int = 0
+    rejected: int = 0
+    ids: int = 0
+
+    def as_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+@dataclass
+class Stub:
+    """A stub downstream, `app` is its ASGI application"""
+
+    name: str
+    settings: StubSettings
+    seed: int = 0
+    stats: StubStats = field(default_factory=StubStats)
+    app: Optional[Starlette] = field(default=None, repr=False)
+
+    def __post_init__(self) -> None:
+        self.rng = random.Random(self.seed)
+        self.latency = parse_latency(self.settings.latency)
+
+    async def respond(self, request: Request, data: Callable[[List[int]], list]):
+        self.stats.requests += 1
+        await asyncio.sleep(self.latency(self.rng))
+        if self.rng.random() < self.settings.fail_percent:
+            self.stats.failures += 1
+            return JSONResponse({"error": "Random failure"}, status_code=500)
+
+        raw_ids = request.query_params.get("ids") or request.query_params.get("id")
+        ids = [int(i) for i in raw_ids.split(",")] if raw_ids else []
+        max_allowed = self.settings.max_allowed
+        if max_allowed and len(ids) > max_allowed:
+            self.stats.rejected += 1
+            return JSONResponse({"error": "Too many ids"}, status_code=400)
+
+        self.stats.ids += len(ids)
+        return JSONResponse({"data": data(ids)})
+
+
+def create_stubs(
+    catalog: Catalog,
+    movie_search: StubSettings,
+    movie_info: StubSettings,
+    artist_info: StubSettings,
+    seed: int = 0,
+) -> Dict[str, Stub]:
+    """Stubs by downstream name, with their ASGI app as `stub.app`"""
+    stubs = {
+        "movie-search": Stub("movie-search", movie_search, seed),
+        "movie-info": Stub("movie-info", movie_info, seed + 1),
+        "artist-info": Stub("artist-info", artist_info, seed + 2),
+    }
+
+    async def search(request: Request):
+        genre = request.query_params.get("genre")
+        return await stubs["movie-search"].respond(
+            request, lambda _: catalog.movies_ids(genre)
+        )
+
+    async def movies(request: Request):
+        return await stubs["movie-info"].respond(
+            request, lambda ids: [catalog.movies[i] for i in ids if i in catalog.movies]
+        )
+
+    async def artists(request: Request):
+        return await stubs["artist-info"].respond(
+            request,
+            lambda ids: [catalog.artists[i] for i in ids if i in catalog.artists],
+        )
+
+    for stub, route in (
+        (stubs["movie-search"], Route("/movies", search)),
+        (stubs["movie-info"], Route("/movies", movies)),
+        (stubs["artist-info"], Route("/artists", artists)),
+    ):
+        stub.app = Starlette(routes=[route])
+
+    return stubs
+
+
+async def serve(stubs: Dict[str, Stub], ports: Dict[str, int]) -> None:
+    import uvicorn
+
+    servers = [
+        uvicorn.Server(
+            uvicorn.Config(stub.app, port=ports[name], log_level="warning")
+        )
+        for name, stub in stubs.items()
+    ]
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", default="lognormal:0.02,0.5")
+    parser.add_argument(
+        "--fail", default="0.1,0.2,0.5", help="movie-search,movie-info,artist-info"
+    )
+    parser.add_argument("--max-allowed", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    search_fail, info_fail, artist_fail = (float(f) for f in args.fail.split(","))
+    stubs = create_stubs(
+        Catalog.generate(seed=args.seed),
+        StubSettings(args.latency, search_fail),
+        StubSettings(args.latency, info_fail, args.max_allowed),
+        StubSettings(args.latency, artist_fail, args.max_allowed),
+        seed=args.seed,
+    )
+    asyncio.run(
+        serve(stubs, {"movie-search": 3040, "movie-info": 3030, "artist-info": 3050})
+    )
+
+
+if __name__ == "__main__":
+    main()